@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+POST_JOB = os.path.join(ROOT, "post-job.py")
+FAKE_GREENHOUSE = os.path.join(ROOT, "fake-greenhouse.py")
+JOB_ID = "123456"
+
+
+###############################################################
+class StandIn:
+    """A fake-greenhouse.py server of its own, with its own session and posts
+    index, for one post-job.py run."""
+
+    def __init__(self, args, posts=0):
+        self.data_dir = tempfile.TemporaryDirectory()
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        self.env = dict(
+            os.environ,
+            XDG_DATA_HOME=self.data_dir.name,
+            GREENHOUSE_URL=f"http://127.0.0.1:{self.port}",
+        )
+        self.server = subprocess.Popen(
+            [
+                sys.executable,
+                FAKE_GREENHOUSE,
+                JOB_ID,
+                "--port",
+                str(self.port),
+                "--posts",
+                str(posts),
+                "--page-size",
+                str(args.page_size),
+                "--latency",
+                str(args.latency),
+                "--write-session",
+            ],
+            env=self.env,
+            stdout=subprocess.DEVNULL,
+        )
+        self.wait_until_listening()
+
+    def wait_until_listening(self):
+        for _ in range(100):
+            try:
+                socket.create_connection(("127.0.0.1", self.port)).close()
+                return
+            except ConnectionRefusedError:
+                time.sleep(0.05)
+        raise RuntimeError("fake-greenhouse.py did not start")
+
+    def run(self, *post_job_args):
+        """Run post-job.py against the stand-in, returning its --metrics events,
+        or None if it failed."""
+        metrics = os.path.join(self.data_dir.name, "metrics.jsonl")
+        result = subprocess.run(
+            [sys.executable, POST_JOB, *post_job_args, "--metrics", metrics],
+            env=self.env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        if result.returncode:
+            print(f"   post-job.py failed: {result.stderr.strip().splitlines()[-1]}")
+            return None
+        with open(metrics) as f:
+            return [json.loads(line) for line in f]
+
+    def close(self):
+        self.server.terminate()
+        self.server.wait()
+        self.data_dir.cleanup()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def span_total(events, phase):
+    return sum(event["seconds"] for event in events if event["phase"] == phase)
+
+
+def posts_per_minute(events):
+    # From the first create starting to the last post being published, leaving
+    # out starting the browser and reading the job
+    creates = [event for event in events if event["phase"] == "create"]
+    if not creates:
+        return 0
+    start = min(event["time"] - event["seconds"] for event in creates)
+    end = max(
+        event["time"] for event in events if event["phase"] in ("create", "publish")
+    )
+    return sum(event["ok"] for event in creates) * 60 / (end - start)
+
+
+###############################################################
+def modes(args, backend):
+    yield "sequential", []
+    yield f"--workers {args.workers}", ["--workers", str(args.workers)]
+    if backend == "http":
+        yield f"--concurrency {args.concurrency}", [
+            "--concurrency",
+            str(args.concurrency),
+            "--rate",
+            str(args.rate),
+        ]
+
+
+def bench_create(args, backend):
+    for mode, mode_args in modes(args, backend):
+        with StandIn(args) as stand_in:
+            events = stand_in.run(
+                JOB_ID,
+                "--region",
+                *args.regions,
+                "--backend",
+                backend,
+                "--headless",
+                *mode_args,
+            )
+        if events is not None:
+            yield f"{backend} create, {mode}", "posts/min", posts_per_minute(events)
+
+
+def bench_harvest(args, backend):
+    for posts in args.posts:
+        with StandIn(args, posts) as stand_in:
+            # us-boston is the smallest region, the run is mostly the harvest
+            events = stand_in.run(
+                JOB_ID, "--region", "us-boston", "--backend", backend, "--headless"
+            )
+        if events is not None:
+            seconds = span_total(events, "harvest page")
+            yield f"{backend} harvest, {posts} posts", "s", seconds
+
+
+def bench_reset(args, backend):
+    for posts in args.posts:
+        with StandIn(args, posts) as stand_in:
+            events = stand_in.run(
+                JOB_ID, "--reset-all", "--backend", backend, "--headless"
+            )
+        if events is not None:
+            seconds = span_total(events, "harvest page") + span_total(events, "delete")
+            yield f"{backend} reset, {posts} posts", "s", seconds
+
+
+BENCHMARKS = {"create": bench_create, "harvest": bench_harvest, "reset": bench_reset}
+
+
+###############################################################
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark post-job.py against local fake-greenhouse.py servers."
+    )
+    parser.add_argument(
+        "--backend",
+        dest="backends",
+        nargs="+",
+        choices=["selenium", "http"],
+        default=["http"],
+        help="The backends to benchmark (default is http)",
+    )
+    parser.add_argument(
+        "--benchmark",
+        dest="benchmarks",
+        nargs="+",
+        choices=sorted(BENCHMARKS.keys()),
+        default=list(BENCHMARKS.keys()),
+        help="The benchmarks to run (default is all of them)",
+    )
+    parser.add_argument(
+        "--region",
+        dest="regions",
+        nargs="+",
+        default=["emea"],
+        help="The regions to create posts in (default is emea)",
+    )
+    parser.add_argument(
+        "--posts",
+        type=int,
+        nargs="+",
+        default=[50, 200, 800],
+        help="Post counts to harvest and reset (default is 50 200 800)",
+    )
+    parser.add_argument(
+        "--page-size",
+        type=int,
+        default=50,
+        help="The most posts on a page, whatever per_page asks for (default is 50)",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.05,
+        help="Seconds the stand-in waits before each response (default is 0.05)",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=4, help="Workers for --workers (default is 4)"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=16,
+        help="Requests in flight for --concurrency (default is 16)",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=100,
+        help="Requests per second for --concurrency (default is 100)",
+    )
+    parser.add_argument("--output", help="Save the results to this JSON file")
+    parser.add_argument(
+        "--baseline", help="Compare with the results saved by an earlier --output"
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = {}
+    for benchmark in args.benchmarks:
+        for backend in args.backends:
+            for name, unit, value in BENCHMARKS[benchmark](args, backend):
+                results[name] = value
+                line = f"{name}: {value:.1f} {unit}"
+                if name in baseline and baseline[name]:
+                    change = (value - baseline[name]) / baseline[name] * 100
+                    line += f" ({change:+.0f}% on the baseline)"
+                print(line)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,592 @@
+#!/usr/bin/env python3
+
+import argparse
+import html
+import json
+import os
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from textwrap import dedent
+from urllib.parse import parse_qs, urlparse
+
+from appdirs import user_data_dir
+
+SESSION_COOKIE = "_greenhouse_session"
+JOB_BOARDS_PROTECTED = ["Canonical", "INTERNAL"]
+REJECTION_REASONS = [
+    "Lacking skill(s)/qualification(s)",
+    "Wrong geography",
+    "Other (add notes below)",
+]
+REJECTION_TEMPLATES = ["Candidate rejection - application stage"]
+
+
+###############################################################
+class Greenhouse:
+    """In-memory stand-in for the job posts of a few Greenhouse jobs."""
+
+    def __init__(self, args):
+        self.lock = threading.Lock()
+        self.session = args.session
+        self.csrf_token = "stand-in-csrf-token"
+        self.page_size = args.page_size
+        self.next_id = 100000
+        self.rate_limit = args.rate_limit
+        self.window = (0, 0)
+        self.jobs = {}
+        self.posts = {}
+        # Every application exists, until it is rejected
+        self.rejected = {}
+        for job_id in args.job_ids:
+            self.jobs[job_id] = []
+            for parent in range(1, args.parents + 1):
+                self.add(
+                    job_id,
+                    f"Role {job_id}-{parent}",
+                    "Canonical",
+                    "Home based - Europe, London",
+                    live=True,
+                )
+            for n in range(args.posts):
+                # Spread the duplicates' ages evenly up to --max-age days
+                self.add(
+                    job_id,
+                    f"Role {job_id}-{n % args.parents + 1}",
+                    "Canonical - Jobs",
+                    f"Home based - Europe, Town {n}",
+                    live=True,
+                    age=args.max_age * n / max(args.posts - 1, 1),
+                )
+
+    def add(self, job_id, name, board, location, live=False, age=0):
+        self.next_id += 1
+        created = datetime.now(timezone.utc) - timedelta(days=age)
+        post = {
+            "id": str(self.next_id),
+            "job_id": job_id,
+            "name": name,
+            "board": board,
+            "offices": location,
+            "live": live,
+            "draft": not live,
+            "external": board not in JOB_BOARDS_PROTECTED,
+            "created": created.isoformat(timespec="seconds"),
+        }
+        self.jobs[job_id].append(post)
+        self.posts[post["id"]] = post
+        return post
+
+    def page(self, job_id, page, per_page=None):
+        # Like Greenhouse, per_page can ask for fewer posts, never more
+        per_page = min(per_page or self.page_size, self.page_size)
+        posts = self.jobs[job_id]
+        start = (page - 1) * per_page
+        end = start + per_page
+        return posts[start:end], end < len(posts)
+
+    def throttled(self):
+        # At most rate_limit requests in any one second, like an API quota
+        if not self.rate_limit:
+            return False
+        second, count = self.window
+        now = int(time.monotonic())
+        count = count + 1 if now == second else 1
+        self.window = (now, count)
+        return count > self.rate_limit
+
+    def remove(self, app_id):
+        post = self.posts.pop(app_id)
+        self.jobs[post["job_id"]].remove(post)
+
+
+###############################################################
+# Just enough of the Greenhouse UI for the Selenium backend to click through:
+# the publish, unpublish and delete buttons of each post, and their dialogs
+JOB_POSTS_JS = dedent(
+    """
+    const csrfToken = document.querySelector('meta[name="csrf-token"]').content
+    const send = (url, method) =>
+        fetch(url, {method: method, headers: {"X-CSRF-Token": csrfToken}})
+    let pendingRow = null
+    document.addEventListener("click", (event) => {
+        const elem = event.target
+        const row = elem.closest("tr.job-application")
+        if (elem.matches(".publish-application-button")) {
+            send(`/jobapps/${row.dataset.id}/publish`, "POST").then(() => {
+                row.classList.replace("draft", "live")
+                elem.className = "unpublish-application-button"
+            })
+        } else if (elem.matches(".unpublish-application-button")) {
+            pendingRow = row
+            const dialog = document.createElement("div")
+            dialog.id = "unpublish-dialog"
+            dialog.innerHTML = '<a href="#">Unpublish</a>'
+            document.body.append(dialog)
+        } else if (elem.closest("#unpublish-dialog")) {
+            event.preventDefault()
+            const row = pendingRow
+            elem.closest("#unpublish-dialog").remove()
+            send(`/jobapps/${row.dataset.id}/unpublish`, "POST").then(() => {
+                row.classList.replace("live", "draft")
+                row.querySelector(".unpublish-application-button").className =
+                    "publish-application-button"
+            })
+        } else if (elem.matches(".options-toggle")) {
+            elem.nextElementSibling.style.display = "block"
+        } else if (elem.matches(".delete-post")) {
+            event.preventDefault()
+            pendingRow = row
+            document.getElementById("confirm-delete-post").style.display = "inline"
+        } else if (elem.id === "confirm-delete-post") {
+            event.preventDefault()
+            const row = pendingRow
+            elem.style.display = "none"
+            send(`/jobapps/${row.dataset.id}`, "DELETE").then(() => row.remove())
+        }
+    })"""
+)
+
+# The duplicate form hydrates, and the location autocomplete answers, only
+# after the page's latency, like the React form on Greenhouse
+DUPLICATE_FORM_JS = dedent(
+    """
+    const latency = LATENCY
+    const csrfToken = document.querySelector('meta[name="csrf-token"]').content
+    const field = (name) => document.querySelector(`[name="${name}"]`)
+    setTimeout(() => { field("name").value = "Copy of " + PARENT_NAME }, latency)
+
+    const menu = document.querySelector(".ui-menu")
+    field("publish_location").addEventListener("input", (event) => {
+        const text = event.target.value
+        // Like Greenhouse, the city asked for is not always the first offered
+        const cities = [`${text} Heights`, text].filter((city) => city.includes(text))
+        setTimeout(() => {
+            menu.innerHTML = cities
+                .map((city, n) => `<li class="ui-menu-item" data-id="${n}"><div>${city}</div></li>`)
+                .join("")
+            menu.style.display = "block"
+        }, latency)
+    })
+    const pick = (item) => {
+        field("publish_location").value = item.textContent
+        menu.style.display = "none"
+    }
+    field("publish_location").addEventListener("keydown", (event) => {
+        const item = menu.querySelector(".ui-menu-item div")
+        if (event.key === "Tab" && item) {
+            pick(item)
+        }
+    })
+    menu.addEventListener("click", (event) => {
+        const item = event.target.closest(".ui-menu-item")
+        if (item) {
+            pick(item)
+        }
+    })
+    document.querySelector("form").addEventListener("submit", (event) => {
+        event.preventDefault()
+    })
+    document.getElementById("save").addEventListener("click", (event) => {
+        event.preventDefault()
+        const form = new URLSearchParams({
+            "greenhouse_job_application_id": PARENT_ID,
+            "job_application[name]": field("name").value,
+            "job_application[job_board]": field("board").value,
+            "job_application[location]": field("location").value,
+            "job_application[publish_location]": field("publish_location").value,
+            "job_application[remote]": field("remote").checked ? "1" : "0",
+            "job_application[indeed]": field("indeed").checked ? "1" : "0",
+        })
+        fetch(`/plans/${JOB_ID}/jobapps`, {
+            method: "POST",
+            headers: {"X-CSRF-Token": csrfToken, "Accept": "application/json"},
+            body: form,
+        }).then(() => {
+            // Like Greenhouse, land back on the first page of posts
+            location.href = `/plans/${JOB_ID}/jobapp`
+        })
+    })"""
+)
+
+
+# The reject button of the application review page, and the rejection form it
+# opens, whose send button is enabled once a template is chosen
+APPLICATION_REVIEW_JS = dedent(
+    """
+    const csrfToken = document.querySelector('meta[name="csrf-token"]').content
+    const field = (id) => document.getElementById(id)
+    field("reject_button").addEventListener("click", () => {
+        field("rejection").style.display = "block"
+    })
+    field("rejection_template_chooser").addEventListener("change", (event) => {
+        field("reject_with_email_button").disabled = !event.target.value
+    })
+    field("reject_with_email_button").addEventListener("click", (event) => {
+        const form = new URLSearchParams({
+            "rejection_reason": field("rejection_reason").selectedOptions[0].text,
+            "rejection_reason_note": field("rejection_reason_note").value,
+            "rejection_template":
+                field("rejection_template_chooser").selectedOptions[0].text,
+            "send_email": "1",
+        })
+        fetch(`/applications/${APPLICATION_ID}/reject`, {
+            method: "POST",
+            headers: {"X-CSRF-Token": csrfToken},
+            body: form,
+        }).then(() => {
+            field("rejection").outerHTML = "<p>Rejected</p>"
+        })
+    })"""
+)
+
+
+def render_page(greenhouse, body, script):
+    return (
+        f"<html><head>"
+        f'<meta name="csrf-token" content="{greenhouse.csrf_token}">'
+        f"</head><body>{body}<script>{script}</script></body></html>"
+    )
+
+
+def render_job_posts(greenhouse, job_id, page, per_page=None):
+    posts, has_next_page = greenhouse.page(job_id, page, per_page)
+    rows = []
+    for post in posts:
+        state = "live" if post["live"] else "draft"
+        external = " external" if post["external"] else ""
+        if post["live"]:
+            toggle = '<img class="unpublish-application-button" alt="Disable">'
+        else:
+            toggle = '<img class="publish-application-button" alt="Enable">'
+        rows.append(
+            f'<tr class="job-application {state}{external}" data-id="{post["id"]}">'
+            f'<td><a class="job-edit-pencil" href="/jobapps/{post["id"]}/edit">Edit</a>'
+            f'<div class="job-application__name">{html.escape(post["name"])}'
+            f"<div>Job post</div></div>"
+            f'<span class="job-application__offices">({html.escape(post["offices"])})</span>'
+            f'<time datetime="{post["created"]}">{post["created"][:10]}</time>'
+            f"{toggle}</td>"
+            f'<td class="board-column">{html.escape(post["board"])}</td>'
+            f'<td><div><div class="options-toggle">Options</div>'
+            f'<div style="display: none"><span><a href="#" class="delete-post">Delete</a>'
+            f"</span></div></div></td></tr>"
+        )
+    if has_next_page:
+        next_page = f'<a class="next_page" rel="next" href="?page={page + 1}">Next</a>'
+    else:
+        next_page = '<span class="next_page disabled">Next</span>'
+    return render_page(
+        greenhouse,
+        f'<table id="job_applications"><thead><tr><th>Post</th><th>Board</th></tr></thead>'
+        f'<tbody>{"".join(rows)}</tbody></table>'
+        f'<div class="pagination">{next_page}</div>'
+        f'<a href="#" id="confirm-delete-post" style="display: none">Delete</a>',
+        JOB_POSTS_JS,
+    )
+
+
+def render_duplicate_form(greenhouse, job_id, parent, latency):
+    script = (
+        DUPLICATE_FORM_JS.replace("LATENCY", str(int(latency * 1000)))
+        .replace("PARENT_NAME", json.dumps(parent["name"]))
+        .replace("PARENT_ID", json.dumps(parent["id"]))
+        .replace("JOB_ID", json.dumps(job_id))
+    )
+    return render_page(
+        greenhouse,
+        "<form><div><label>Job Name</label>"
+        '<input class="Input__InputElem-sc-ipbxf8-0" name="name"></div>'
+        '<div><label>Post To</label><input name="board"></div>'
+        '<div><label>Location</label><input name="location"></div>'
+        '<label>Indeed<input type="checkbox" name="indeed"></label>'
+        '<div><input placeholder="Select location" name="publish_location">'
+        '<ul class="ui-menu" style="display: none"></ul></div>'
+        '<label>Remote<input type="checkbox" name="remote"></label>'
+        '<a href="#" id="save">Save</a></form>',
+        script,
+    )
+
+
+def render_options(texts):
+    return "".join(
+        f'<option value="{n}">{html.escape(text)}</option>'
+        for n, text in enumerate(texts, 1)
+    )
+
+
+def render_application_review(greenhouse, app_id):
+    if app_id in greenhouse.rejected:
+        body = "<p>Rejected</p>"
+    else:
+        body = (
+            '<div id="actions"><button id="reject_button">Reject</button></div>'
+            '<div id="rejection" style="display: none">'
+            f'<select id="rejection_reason">{render_options(REJECTION_REASONS)}</select>'
+            '<textarea id="rejection_reason_note"></textarea>'
+            '<select id="rejection_template_chooser"><option value=""></option>'
+            f"{render_options(REJECTION_TEMPLATES)}</select>"
+            '<button id="reject_with_email_button" disabled>Reject</button></div>'
+        )
+    return render_page(
+        greenhouse,
+        body,
+        APPLICATION_REVIEW_JS.replace("APPLICATION_ID", json.dumps(app_id)),
+    )
+
+
+def make_handler(greenhouse, args):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        latency = args.latency
+
+        def log_message(self, format, *log_args):
+            if args.verbose:
+                super().log_message(format, *log_args)
+
+        def send(self, status, body="", content_type="text/html", headers=()):
+            if self.flaky:
+                # The change is made all the same, only the answer is lost
+                status, body, content_type = 503, "Unavailable", "text/plain"
+            body = body.encode()
+            self.send_response(status)
+            self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def signed_in(self):
+            cookies = self.headers.get("Cookie", "")
+            return f"{SESSION_COOKIE}={greenhouse.session}" in cookies
+
+        def handle_request(self, method):
+            url = urlparse(self.path)
+            time.sleep(args.latency)
+            self.flaky = method != "GET" and random.random() < args.flaky
+
+            if url.path in ("/favicon.ico", "/sso"):
+                return self.send(200, "<html><body>Stand-in SSO</body></html>")
+            if not self.signed_in():
+                # Like Greenhouse, bounce anonymous users to SSO on another host
+                return self.send(
+                    302, headers=[("Location", f"http://localhost:{args.port}/sso")]
+                )
+            if method != "GET" and (
+                self.headers.get("X-CSRF-Token") != greenhouse.csrf_token
+            ):
+                return self.send(422, "Invalid authenticity token", "text/plain")
+
+            with greenhouse.lock:
+                if greenhouse.throttled():
+                    return self.send(
+                        429, "Slow down", "text/plain", [("Retry-After", "1")]
+                    )
+                for pattern, route in ROUTES[method]:
+                    match = re.fullmatch(pattern, url.path)
+                    if match:
+                        return route(self, greenhouse, url, *match.groups())
+            self.send(404, "Not found", "text/plain")
+
+        def do_GET(self):
+            self.handle_request("GET")
+
+        def do_POST(self):
+            self.handle_request("POST")
+
+        def do_DELETE(self):
+            self.handle_request("DELETE")
+
+        def form(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = self.rfile.read(length).decode()
+            return {key: values[0] for key, values in parse_qs(body).items()}
+
+    return Handler
+
+
+###############################################################
+def dashboard(handler, greenhouse, url):
+    handler.send(200, "<html><body>Dashboard</body></html>")
+
+
+def job_posts(handler, greenhouse, url, job_id):
+    if job_id not in greenhouse.jobs:
+        return handler.send(404, "Not found", "text/plain")
+    query = parse_qs(url.query)
+    page = int(query.get("page", ["1"])[0])
+    per_page = int(query.get("per_page", ["0"])[0])
+    handler.send(200, render_job_posts(greenhouse, job_id, page, per_page))
+
+
+def duplicate_form(handler, greenhouse, url, job_id):
+    # post-job.py asks for this with an &amp; in the query string
+    query = parse_qs(url.query.replace("&amp;", "&"))
+    parent = greenhouse.posts.get(query.get("greenhouse_job_application_id", [""])[0])
+    if job_id not in greenhouse.jobs or parent is None:
+        return handler.send(404, "Not found", "text/plain")
+    handler.send(
+        200, render_duplicate_form(greenhouse, job_id, parent, handler.latency)
+    )
+
+
+def duplicate_post(handler, greenhouse, url, job_id):
+    form = handler.form()
+    parent = greenhouse.posts.get(form.get("greenhouse_job_application_id"))
+    if job_id not in greenhouse.jobs or parent is None:
+        return handler.send(404, "Not found", "text/plain")
+    post = greenhouse.add(
+        job_id,
+        form.get("job_application[name]", parent["name"]),
+        form.get("job_application[job_board]", parent["board"]),
+        form["job_application[location]"],
+    )
+    handler.send(201, json.dumps(post), "application/json")
+
+
+def application_review(handler, greenhouse, url):
+    app_id = parse_qs(url.query).get("application_id", [""])[0]
+    if not app_id.isdigit():
+        return handler.send(404, "Not found", "text/plain")
+    handler.send(200, render_application_review(greenhouse, app_id))
+
+
+def reject_application(handler, greenhouse, url, app_id):
+    form = handler.form()
+    if app_id in greenhouse.rejected:
+        return handler.send(409, "Already rejected", "text/plain")
+    if (
+        form.get("rejection_reason") not in REJECTION_REASONS
+        or form.get("rejection_template") not in REJECTION_TEMPLATES
+    ):
+        return handler.send(422, "Unknown reason or template", "text/plain")
+    greenhouse.rejected[app_id] = form
+    handler.send(200, json.dumps({"id": app_id, "status": "rejected"}))
+
+
+def set_live(live):
+    def route(handler, greenhouse, url, app_id):
+        post = greenhouse.posts.get(app_id)
+        if post is None:
+            return handler.send(404, "Not found", "text/plain")
+        post["live"], post["draft"] = live, not live
+        handler.send(200, json.dumps(post), "application/json")
+
+    return route
+
+
+def delete_post(handler, greenhouse, url, app_id):
+    if app_id not in greenhouse.posts:
+        return handler.send(404, "Not found", "text/plain")
+    greenhouse.remove(app_id)
+    handler.send(204)
+
+
+ROUTES = {
+    "GET": [
+        (r"/", dashboard),
+        (r"/plans/(\d+)/jobapp", job_posts),
+        (r"/plans/(\d+)/jobapps/new", duplicate_form),
+        (r"/application_review", application_review),
+    ],
+    "POST": [
+        (r"/plans/(\d+)/jobapps", duplicate_post),
+        (r"/jobapps/(\d+)/publish", set_live(True)),
+        (r"/jobapps/(\d+)/unpublish", set_live(False)),
+        (r"/applications/(\d+)/reject", reject_application),
+    ],
+    "DELETE": [
+        (r"/jobapps/(\d+)", delete_post),
+    ],
+}
+
+
+###############################################################
+def write_session(args):
+    # Matches the cookies post-job.py saves after signing in through SSO
+    path = os.path.join(user_data_dir("greenhouse"), "session.json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(
+            [{"name": SESSION_COOKIE, "value": args.session, "domain": args.host}], f
+        )
+    print(f"Wrote a stand-in session to {path}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Serve a local stand-in for the Greenhouse job posts pages."
+    )
+    parser.add_argument(
+        "job_ids", nargs="+", help="The numeric job ids to serve posts for"
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on")
+    parser.add_argument(
+        "--parents", type=int, default=1, help="Parent posts per job (default is 1)"
+    )
+    parser.add_argument(
+        "--posts", type=int, default=0, help="Duplicated posts per job (default is 0)"
+    )
+    parser.add_argument(
+        "--max-age",
+        type=float,
+        default=0,
+        help="Days old the oldest duplicated post is (default is 0)",
+    )
+    parser.add_argument(
+        "--page-size",
+        type=int,
+        default=50,
+        help="The most posts on a page, whatever per_page asks for (default is 50)",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="Seconds to wait before answering each request",
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=int,
+        default=0,
+        help="Answer 429 past this many requests per second (default is no limit)",
+    )
+    parser.add_argument(
+        "--flaky",
+        type=float,
+        default=0.0,
+        help="Fraction of changes answered 503 after they are made (default is 0)",
+    )
+    parser.add_argument(
+        "--session", default="stand-in", help="The session cookie value to accept"
+    )
+    parser.add_argument(
+        "--write-session",
+        action="store_true",
+        help="Save the session cookie where post-job.py looks for it",
+    )
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    greenhouse = Greenhouse(args)
+    if args.write_session:
+        write_session(args)
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(greenhouse, args))
+    print(f"Serving a stand-in Greenhouse on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,205 +1,366 @@
 #!/usr/bin/env python3
 
 import argparse
+import asyncio
+import csv
+import itertools
 import json
 import os
+import queue
+import re
+import signal
+import socket
+import sqlite3
+import sys
+import threading
 import time
+import traceback
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, redirect_stderr, redirect_stdout
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from html.parser import HTMLParser
 from textwrap import dedent
+from urllib.parse import urlparse
 
-import selenium
-import selenium.webdriver.support.ui as ui
+import requests
+import urllib3
 from appdirs import user_data_dir
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
 
-gh_url = "https://canonical.greenhouse.io"
+gh_url = os.environ.get("GREENHOUSE_URL", "https://canonical.greenhouse.io")
 JOB_BOARD = "Canonical - Jobs"
 JOB_BOARDS_PROTECTED = ["Canonical", "INTERNAL"]
+# The most posts Greenhouse lists on one page of a job
+PAGE_SIZE = 500
 
-REGIONS = {
-    "americas": [
-        # United States
-        "Home based - Americas, Albany",
-        "Home based - Americas, Anchorage",
-        "Home based - Americas, Atlanta",
-        "Home based - Americas, Austin",
-        "Home based - Americas, Baltimore",
-        "Home based - Americas, Boston",
-        "Home based - Americas, Buffalo",
-        "Home based - Americas, Charlotte",
-        "Home based - Americas, Chicago",
-        "Home based - Americas, Cincinnati",
-        "Home based - Americas, Cleveland",
-        "Home based - Americas, Dallas",
-        "Home based - Americas, Dayton",
-        "Home based - Americas, Detroit",
-        "Home based - Americas, Honolulu",
-        "Home based - Americas, Houston",
-        "Home based - Americas, Kansas City",
-        "Home based - Americas, Los Angeles",
-        "Home based - Americas, Madison",
-        "Home based - Americas, Miami",
-        "Home based - Americas, Milwaukee",
-        "Home based - Americas, Minneapolis",
-        "Home based - Americas, New York",
-        "Home based - Americas, Oklahoma City",
-        "Home based - Americas, Omaha",
-        "Home based - Americas, Philadelphia",
-        "Home based - Americas, Phoenix",
-        "Home based - Americas, Pittsburgh",
-        "Home based - Americas, Portland",
-        "Home based - Americas, Raleigh",
-        "Home based - Americas, Rochester",
-        "Home based - Americas, Sacramento",
-        "Home based - Americas, San Diego",
-        "Home based - Americas, San Francisco",
-        "Home based - Americas, Salt Lake City",
-        "Home based - Americas, Seattle",
-        "Home based - Americas, Tulsa",
-        "Home based - Americas, Wichita",
-        "Home based - Americas, Washington",
-        # Canada
-        "Home based - Americas, Calgary",
-        "Home based - Americas, Montreal",
-        "Home based - Americas, Ottawa",
-        "Home based - Americas, Toronto",
-        "Home based - Americas, Vancouver",
-        # South America
-        "Home based - Americas, Belo Horizonte",
-        "Home based - Americas, Buenos Aires",
-        "Home based - Americas, Bogota",
-        "Home based - Americas, Caracas",
-        "Home based - Americas, Córdoba",
-        "Home based - Americas, Curitiba",
-        "Home based - Americas, Florianópolis",
-        "Home based - Americas, Guadalajara",
-        "Home based - Americas, Lima",
-        "Home based - Americas, Manaus",
-        "Home based - Americas, Monterrey",
-        "Home based - Americas, Mexico City",
-        "Home based - Americas, Porto Alegre",
-        "Home based - Americas, Rio de Janeiro",
-        "Home based - Americas, Santiago",
-        "Home based - Americas, São Paulo",
-    ],
-    "us-boston": [
-        "Office based - Americas, Brockton, Massachusetts",
-        "Office based - Americas, Brookline, Massachusetts",
-        "Office based - Americas, Cambridge, Massachusetts",
-        "Office based - Americas, Cranston, Rhode Island",
-        "Office based - Americas, Fall River, Massachusetts",
-        "Office based - Americas, Framingham, Massachusetts",
-        "Office based - Americas, Haverhill, Massachusetts",
-        "Office based - Americas, Lawrence, Massachusetts",
-        "Office based - Americas, Lowell, Massachusetts",
-        "Office based - Americas, Lynn, Massachusetts",
-        "Office based - Americas, Malden, Massachusetts",
-        "Office based - Americas, Manchester, New Hampshire",
-        "Office based - Americas, Medford, Massachusetts",
-        "Office based - Americas, Methuen, Massachusetts",
-        "Office based - Americas, Nashua, New Hampshire",
-        "Office based - Americas, New Bedford, Massachusetts",
-        "Office based - Americas, Newton, Massachusetts",
-        "Office based - Americas, Pawtucket, Rhode Island",
-        "Office based - Americas, Peabody, Massachusetts",
-        "Office based - Americas, Plymouth, Massachusetts",
-        "Office based - Americas, Providence, Rhode Island",
-        "Office based - Americas, Quincy, Massachusetts",
-        "Office based - Americas, Revere, Massachusetts",
-        "Office based - Americas, Somerville, Massachusetts",
-        "Office based - Americas, Taunton, Massachusetts",
-        "Office based - Americas, Waltham, Massachusetts",
-        "Office based - Americas, Warwick, Rhode Island",
-        "Office based - Americas, Weymouth, Massachusetts",
-        "Office based - Americas, Worcester, Massachusetts",
-    ],
-    "emea": [
-        "Home based - Africa, Accra",
-        "Home based - Africa, Cairo",
-        "Home based - Africa, Cape Town",
-        "Home based - Africa, Lagos",
-        "Home based - Africa, Nairobi",
-        "Home based - Europe, Amsterdam",
-        "Home based - Europe, Ankara",
-        "Home based - Europe, Athens",
-        "Home based - Europe, Barcelona",
-        "Home based - Europe, Berlin",
-        "Home based - Europe, Bratislava",
-        "Home based - Europe, Brno",
-        "Home based - Europe, Brussels",
-        "Home based - Europe, Bucharest",
-        "Home based - Europe, Budapest",
-        "Home based - Europe, Cluj-Napoca",
-        "Home based - Europe, Dublin",
-        "Home based - Europe, Edinburgh",
-        "Home based - Europe, Eindhoven",
-        "Home based - Europe, Frankfurt",
-        "Home based - Europe, Gdańsk",
-        "Home based - Europe, Glasgow",
-        "Home based - Europe, Helsinki",
-        "Home based - Europe, Istanbul",
-        "Home based - Europe, Kraków",
-        "Home based - Europe, Lisbon",
-        "Home based - Europe, Ljubljana",
-        "Home based - Europe, London",
-        "Home based - Europe, Lyon",
-        "Home based - Europe, Madrid",
-        "Home based - Europe, Manchester",
-        "Home based - Europe, Marousi",  # Athens
-        "Home based - Europe, Milan",
-        "Home based - Europe, Moscow",
-        "Home based - Europe, Munich",
-        "Home based - Europe, Oslo",
-        "Home based - Europe, Paris",
-        "Home based - Europe, Plovdiv",
-        "Home based - Europe, Prague",
-        "Home based - Europe, Riga",
-        "Home based - Europe, Rome",
-        "Home based - Europe, Sofia",
-        "Home based - Europe, St. Petersburg",
-        "Home based - Europe, Stockholm",
-        "Home based - Europe, Tallinn",
-        "Home based - Europe, Timișoara",
-        "Home based - Europe, Thessaloniki",
-        "Home based - Europe, Vienna",
-        "Home based - Europe, Vilnius",
-        "Home based - Europe, Warsaw",
-        "Home based - Europe, Wrocław",
-        "Home based - Europe, Zagreb",
-    ],
-    "apac": [
-        "Home based - Asia Pacific, Auckland",
-        "Home based - Asia Pacific, Bangalore",
-        "Home based - Asia Pacific, Beijing",
-        "Home based - Asia Pacific, Brisbane",
-        "Home based - Asia Pacific, Chennai",
-        "Home based - Asia Pacific, Christchurch",
-        "Home based - Asia Pacific, Delhi",
-        "Home based - Asia Pacific, Gurgaon",
-        "Home based - Asia Pacific, Fukuoka",
-        "Home based - Asia Pacific, Hangzhou",
-        "Home based - Asia Pacific, Hsinchu",
-        "Home based - Asia Pacific, Hong Kong",
-        "Home based - Asia Pacific, Hyderabad",
-        "Home based - Asia Pacific, Kyoto",
-        "Home based - Asia Pacific, Melbourne",
-        "Home based - Asia Pacific, Mumbai",
-        "Home based - Asia Pacific, Nagoya",
-        "Home based - Asia Pacific, Osaka",
-        "Home based - Asia Pacific, Pune",
-        "Home based - Asia Pacific, Sapporo",
-        "Home based - Asia Pacific, Seoul",
-        "Home based - Asia Pacific, Shanghai",
-        "Home based - Asia Pacific, Singapore",
-        "Home based - Asia Pacific, Sydney",
-        "Home based - Asia Pacific, Taipei",
-        "Home based - Asia Pacific, Tokyo",
-        "Home based - Asia Pacific, Wellington",
-        "Home based - Asia Pacific, Yokohama",
-    ],
+# The locations of each region are kept in regions.json, next to this script
+REGIONS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "regions.json")
+# The layout of regions.json this script reads, its "version" is that of the
+# locations themselves
+REGIONS_FORMAT = 1
+
+
+def location_key(location_text):
+    """What location texts are compared by, regardless of case and spacing."""
+    return " ".join(location_text.casefold().split())
+
+
+@dataclass(frozen=True)
+class Location:
+    text: str
+    key: str
+    publish_label: str
+    regions: tuple
+
+
+class RegionCatalog:
+    """Every location of every region, indexed by key, with its publish
+    location label and the regions it is in worked out once."""
+
+    def __init__(self, data):
+        self.version = data["version"]
+        self.regions = {
+            region: tuple(texts) for region, texts in data["regions"].items()
+        }
+        members = defaultdict(list)
+        for region, texts in self.regions.items():
+            for text in texts:
+                members[text].append(region)
+        labels = data.get("publish_labels", {})
+        self.by_key = {}
+        for text, regions in members.items():
+            # The publish location is the city, without the "Home based"
+            # prefix, unless regions.json says otherwise
+            label = labels.get(text) or text.split(",", 1)[-1].strip()
+            key = location_key(text)
+            self.by_key[key] = Location(text, key, label, tuple(regions))
+
+    @staticmethod
+    def problems(data):
+        if data.get("format") != REGIONS_FORMAT:
+            return [f"format {data.get('format')} is not {REGIONS_FORMAT}"]
+        problems, texts_by_key = [], {}
+        for region, texts in data["regions"].items():
+            if not texts:
+                problems.append(f"region {region} has no locations")
+            if len(set(texts)) != len(texts):
+                problems.append(f"region {region} lists a location twice")
+            for text in texts:
+                other = texts_by_key.setdefault(location_key(text), text)
+                if other != text:
+                    problems.append(
+                        f"'{text}' and '{other}' only differ in case or spacing"
+                    )
+        for text in data.get("publish_labels", {}):
+            if text not in texts_by_key.values():
+                problems.append(f"publish label for '{text}', which is in no region")
+        return problems
+
+    @classmethod
+    def load(cls, path=REGIONS_FILE):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        problems = cls.problems(data)
+        if problems:
+            raise SystemExit("\n".join([f"Can not use {path}:", *problems]))
+        return cls(data)
+
+    def get(self, location_text):
+        return self.by_key.get(location_key(location_text))
+
+    def publish_label(self, location_text):
+        location = self.get(location_text)
+        if location is None:
+            return location_text.split(",", 1)[-1].strip()
+        return location.publish_label
+
+
+CATALOG = RegionCatalog.load()
+REGIONS = CATALOG.regions
+
+# The shortcut buttons app-review.tm.js adds to the application review page,
+# each a rejection reason and the note that goes with it
+REJECTION_PRESETS = {
+    "Lacking Skills": ("Lacking skill(s)/qualification(s)", ""),
+    "No Cover Letter": ("Other (add notes below)", "No cover letter"),
+    "Wrong Timezone": ("Wrong geography", ""),
+    "Wrong Job": (
+        "Other (add notes below)",
+        "Cover letter is for a different job/company",
+    ),
+    "Illegible": ("Other (add notes below)", "Submission not in English"),
 }
+REJECTION_TEMPLATE = "Candidate rejection - application stage"
+
+###############################################################
+def load_selenium():
+    # Selenium is only imported once we are about to drive a browser, so that
+    # --dry-run works without it
+    global selenium, ui, webdriver, Options, FirefoxOptions, By, Keys, EC
+    import selenium
+    import selenium.webdriver.support.ui as ui
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.common.keys import Keys
+    from selenium.webdriver.firefox.options import Options as FirefoxOptions
+    from selenium.webdriver.support import expected_conditions as EC
+
+
+###############################################################
+# Named readiness predicates: (timeout in seconds, predicate). Each predicate
+# takes the browser plus any keyword arguments given to Readiness.until() and
+# returns something truthy once the page is ready for the next step.
+READINESS = {
+    "2FA prompt shown": (
+        60,
+        lambda browser: browser.find_elements(By.ID, "id_oath_token"),
+    ),
+    "signed in to Greenhouse": (
+        300,
+        lambda browser: signed_in(browser),
+    ),
+    "job_applications table rendered": (
+        60,
+        lambda browser: browser.find_elements(
+            By.CLASS_NAME, "job-application__offices"
+        ),
+    ),
+    "reject button shown": (
+        60,
+        lambda browser: browser.find_elements(By.ID, "reject_button"),
+    ),
+    "rejection form open": (
+        30,
+        lambda browser: browser.find_elements(By.ID, "rejection_reason"),
+    ),
+    "rejection email ready": (
+        30,
+        lambda browser: browser.find_elements(
+            By.CSS_SELECTOR, "#reject_with_email_button:not([disabled])"
+        ),
+    ),
+    "rejection sent": (
+        30,
+        lambda browser, element: EC.staleness_of(element)(browser),
+    ),
+    "duplicate form hydrated": (
+        60,
+        lambda browser: [
+            elem
+            for elem in browser.find_elements(
+                By.XPATH, '//input[contains(@class, "Input__InputElem-sc-ipbxf8-0")]'
+            )
+            if elem.get_attribute("value")
+        ]
+        and browser.find_elements(By.XPATH, '//label[text()="Post To"]/..//input[1]'),
+    ),
+    "autocomplete menu open": (
+        30,
+        lambda browser, text: browser.find_elements(
+            By.XPATH,
+            f'//ul[contains(@class, "ui-menu")]'
+            f'/li[contains(@class, "ui-menu-item")]'
+            f'/div[contains(text(), "{text}")]',
+        ),
+    ),
+    "checkbox ticked": (
+        10,
+        lambda browser, checkbox: checkbox.is_selected(),
+    ),
+    "unpublish confirmation open": (
+        10,
+        lambda browser: browser.find_elements(By.LINK_TEXT, "Unpublish"),
+    ),
+    "delete confirmation open": (
+        10,
+        lambda browser: [
+            elem
+            for elem in browser.find_elements(By.ID, "confirm-delete-post")
+            if elem.is_displayed()
+        ],
+    ),
+    "post removed": (
+        30,
+        lambda browser, row: EC.staleness_of(row)(browser),
+    ),
+    "post published": (
+        30,
+        lambda browser, row: EC.staleness_of(row)(browser)
+        or "draft" not in row.get_attribute("class").split(),
+    ),
+}
+
+
+class Readiness:
+    """Wait on named READINESS predicates, keeping track of time spent."""
+
+    def __init__(self, browser):
+        self.browser = browser
+        self.waited = defaultdict(float)
+
+    def until(self, name, **kwargs):
+        timeout, predicate = READINESS[name]
+        start = time.monotonic()
+        try:
+            return ui.WebDriverWait(
+                self.browser,
+                timeout,
+                poll_frequency=0.1,
+                ignored_exceptions=[
+                    selenium.common.exceptions.NoSuchElementException,
+                    selenium.common.exceptions.StaleElementReferenceException,
+                ],
+            ).until(lambda browser: predicate(browser, **kwargs), message=name)
+        finally:
+            self.waited[name] += time.monotonic() - start
+
+    def summary(self):
+        total = sum(self.waited.values())
+        lines = [f"Time spent waiting on the page: {total:.1f}s"]
+        for name, seconds in sorted(self.waited.items(), key=lambda i: -i[1]):
+            lines.append(f"  {name}: {seconds:.1f}s")
+        return "\n".join(lines)
+
+
+###############################################################
+class Metrics:
+    """Time each phase of a run, for the breakdown printed at the end, the
+    --metrics events and the --prometheus textfile."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.timings = defaultdict(list)
+        self.file = None
+        self.lock = threading.Lock()
+
+    def reset(self):
+        self.close()
+        self.__init__()
+
+    def open(self, path):
+        self.file = open(path, "a")
+
+    @contextmanager
+    def span(self, phase, **labels):
+        start = time.monotonic()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self.observe(phase, time.monotonic() - start, ok=ok, **labels)
+
+    def observe(self, phase, seconds, **labels):
+        with self.lock:
+            self.timings[phase].append(seconds)
+            if self.file is not None:
+                event = dict(time=time.time(), phase=phase, seconds=seconds, **labels)
+                self.file.write(json.dumps(event) + "\n")
+                self.file.flush()
+
+    def quantile(self, phase, q):
+        timings = sorted(self.timings[phase])
+        return timings[min(int(q * len(timings)), len(timings) - 1)]
+
+    def posts_per_minute(self, created):
+        return created * 60 / (time.monotonic() - self.started)
+
+    def summary(self, created):
+        lines = ["Time per phase (count, p50, p95, total):"]
+        for phase, timings in self.timings.items():
+            lines.append(
+                f"  {phase}: {len(timings)}, {self.quantile(phase, 0.5):.2f}s, "
+                f"{self.quantile(phase, 0.95):.2f}s, {sum(timings):.1f}s"
+            )
+        lines.append(f"Created {self.posts_per_minute(created):.1f} posts per minute")
+        return "\n".join(lines)
+
+    def write_prometheus(self, path, created):
+        lines = [
+            "# HELP greenhouse_phase_seconds Time taken by each phase of the run.",
+            "# TYPE greenhouse_phase_seconds summary",
+        ]
+        for phase, timings in self.timings.items():
+            for q in (0.5, 0.95):
+                lines.append(
+                    f'greenhouse_phase_seconds{{phase="{phase}",quantile="{q}"}} '
+                    f"{self.quantile(phase, q):.3f}"
+                )
+            lines.append(
+                f'greenhouse_phase_seconds_sum{{phase="{phase}"}} {sum(timings):.3f}'
+            )
+            lines.append(
+                f'greenhouse_phase_seconds_count{{phase="{phase}"}} {len(timings)}'
+            )
+        lines += [
+            "# HELP greenhouse_posts_created Posts created by the run.",
+            "# TYPE greenhouse_posts_created gauge",
+            f"greenhouse_posts_created {created}",
+            "# HELP greenhouse_posts_per_minute Posts created per minute of the run.",
+            "# TYPE greenhouse_posts_per_minute gauge",
+            f"greenhouse_posts_per_minute {self.posts_per_minute(created):.2f}",
+            "# HELP greenhouse_run_seconds Duration of the run.",
+            "# TYPE greenhouse_run_seconds gauge",
+            f"greenhouse_run_seconds {time.monotonic() - self.started:.1f}",
+            "# HELP greenhouse_run_finished_timestamp_seconds When the run finished.",
+            "# TYPE greenhouse_run_finished_timestamp_seconds gauge",
+            f"greenhouse_run_finished_timestamp_seconds {time.time():.0f}",
+        ]
+        # The node exporter may read the file at any time, never let it see
+        # one half written
+        with open(f"{path}.tmp", "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(f"{path}.tmp", path)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+metrics = Metrics()
+
 
 ###############################################################
 def parse_credentials():
@@ -219,7 +380,7 @@ def parse_credentials():
 
 
 ###############################################################
-def sso_authenticate(browser, args):
+def sso_authenticate(browser, ready, args):
     # print("Inside: sso_authenticate()")
     (ghsso_user, ghsso_pass) = parse_credentials()
 
@@ -266,8 +427,7 @@ def sso_authenticate(browser, args):
 
     if args.headless:
         mfa_token = input("Enter your 2FA token: ")
-        time.sleep(0.2)
-        mfa_txt = browser.find_element(By.XPATH, '//*[@id="id_oath_token"]')
+        mfa_txt = ready.until("2FA prompt shown")[0]
         mfa_txt.send_keys(mfa_token)
         auth_button = browser.find_elements(By.XPATH, '//*[@id="login-form"]/button')[
             0
@@ -275,64 +435,813 @@ def sso_authenticate(browser, args):
 
 
 ###############################################################
-def delete_posts(browser, wait, job_id):
-    browser.get(f"{gh_url}/plans/{job_id}/jobapp")
-    job_post_offset = 0
-    while True:
-        remove_tooltips(browser)
-        browser.refresh()
+def session_file():
+    return os.path.join(user_data_dir("greenhouse"), "session.json")
 
-        job_posts = len(
-            wait.until(
-                lambda browser: browser.find_elements(
-                    By.XPATH, '//*[@id="job_applications"]/tbody/tr'
-                )
+
+def save_session(browser):
+    path = session_file()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # The cookies are as good as a password, keep them to ourselves
+    with open(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as f:
+        json.dump(browser.get_cookies(), f)
+
+
+def load_session():
+    try:
+        with open(session_file(), "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def share_session(browser, cookies):
+    # Cookies can only be set for the domain currently loaded, so land on a
+    # Greenhouse URL that does not bounce unauthenticated users to SSO first
+    gh_host = urlparse(gh_url).hostname
+    browser.get(f"{gh_url}/favicon.ico")
+    for cookie in cookies:
+        if gh_host.endswith(cookie["domain"].lstrip(".")):
+            browser.add_cookie(cookie)
+
+
+def signed_in(browser):
+    return urlparse(browser.current_url).hostname == urlparse(gh_url).hostname
+
+
+def authenticate(browser, ready, args):
+    cookies = None if args.fresh_login else load_session()
+    if cookies:
+        share_session(browser, cookies)
+        # One page load tells us whether Greenhouse still honours the cookies,
+        # an expired session gets bounced to SSO
+        browser.get(gh_url)
+        if signed_in(browser):
+            print("Reusing saved Greenhouse session")
+            return
+        print("Saved Greenhouse session has expired, signing in again")
+        browser.delete_all_cookies()
+
+    with metrics.span("sso"):
+        sso_authenticate(browser, ready, args)
+        ready.until("signed in to Greenhouse")
+    save_session(browser)
+
+
+###############################################################
+class LocationCache:
+    """The suggestion picked from the publish location autocomplete for each
+    location, so every post of a location gets the same one."""
+
+    def __init__(self, path=None):
+        if path is None:
+            path = os.path.join(user_data_dir("greenhouse"), "locations.json")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        try:
+            with open(path, "r") as f:
+                self.suggestions = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.suggestions = {}
+
+    def get(self, location_text):
+        return self.suggestions.get(location_text)
+
+    def label(self, location_text):
+        suggestion = self.get(location_text)
+        return suggestion["label"] if suggestion else None
+
+    def resolved(self, location_text, suggestion, candidates=1):
+        known = self.get(location_text)
+        if known and known["label"] != suggestion["label"]:
+            print(
+                f"NOTE: '{known['label']}' is no longer offered for {location_text}, "
+                f"using '{suggestion['label']}'"
+            )
+        elif known == suggestion:
+            return
+        elif candidates > 1:
+            print(
+                f"NOTE: picked '{suggestion['label']}' of {candidates} suggestions "
+                f"for {location_text}, edit {self.path} if it is the wrong one"
+            )
+        with self.lock:
+            self.suggestions[location_text] = suggestion
+            with open(f"{self.path}.tmp", "w") as f:
+                json.dump(self.suggestions, f, indent=2, sort_keys=True)
+            os.replace(f"{self.path}.tmp", self.path)
+
+
+###############################################################
+# Read the whole job posts table in one WebDriver round trip, rather than one
+# find_elements() per column and one .text/.get_attribute() per cell
+READ_JOB_TABLE_JS = dedent(
+    """
+    const cell = (row, selector) => {
+        const elem = row.querySelector(selector)
+        return elem ? elem.innerText.trim() : ""
+    }
+    const rows = document.querySelectorAll("#job_applications tbody tr")
+    const nextPage = document.getElementsByClassName("next_page")[0]
+    return {
+        rows: Array.from(rows).map((row, index) => {
+            const edit = row.querySelector(".job-edit-pencil")
+            const created = row.querySelector("time[datetime]")
+            return {
+                index: index,
+                id: edit ? edit.href.split("/")[4] : null,
+                name: cell(row, ".job-application__name").split("\\n")[0],
+                board: cell(row, ".board-column"),
+                offices: cell(row, ".job-application__offices").replace(/^[()]+|[()]+$/g, ""),
+                live: row.classList.contains("live"),
+                draft: row.classList.contains("draft"),
+                external: row.classList.contains("external"),
+                created: created ? created.getAttribute("datetime") : null,
+            }
+        // Like JobTableParser, skip the rows with no edit link: they are no post
+        }).filter((row) => row.id),
+        has_next_page: Boolean(nextPage && !nextPage.classList.contains("disabled")),
+    }"""
+)
+
+
+def read_job_table(browser):
+    table = browser.execute_script(READ_JOB_TABLE_JS)
+    return table["rows"], table["has_next_page"]
+
+
+###############################################################
+class PostIndex:
+    """Local SQLite record of the posts under each job, keyed by app id."""
+
+    SCHEMA = dedent(
+        """
+        CREATE TABLE IF NOT EXISTS posts (
+            app_id TEXT PRIMARY KEY,
+            job_id TEXT NOT NULL,
+            name TEXT NOT NULL,
+            board TEXT NOT NULL,
+            location TEXT NOT NULL,
+            parent TEXT,
+            live INTEGER NOT NULL,
+            first_seen REAL NOT NULL,
+            last_seen REAL NOT NULL,
+            created REAL
+        );
+        CREATE INDEX IF NOT EXISTS posts_job_id ON posts (job_id);
+        """
+    )
+
+    def __init__(self, path=None):
+        if path is None:
+            path = os.path.join(user_data_dir("greenhouse"), "posts.sqlite")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(self.SCHEMA)
+        columns = {row["name"] for row in self.db.execute("PRAGMA table_info(posts)")}
+        if "created" not in columns:
+            self.db.execute("ALTER TABLE posts ADD COLUMN created REAL")
+
+    def has(self, job_id):
+        return bool(
+            self.db.execute(
+                "SELECT 1 FROM posts WHERE job_id = ? LIMIT 1", (job_id,)
+            ).fetchone()
+        )
+
+    def posts(self, job_id):
+        return [
+            Post(**row)
+            for row in self.db.execute(
+                "SELECT * FROM posts WHERE job_id = ? ORDER BY rowid", (job_id,)
             )
+        ]
+
+    def update(self, job_id, rows, parent=None):
+        """Record rows read from the job posts table, returning how many of
+        them were new or had changed since they were last seen."""
+        changed = 0
+        now = time.time()
+        with self.db:
+            for row in rows:
+                known = self.db.execute(
+                    "SELECT name, board, location, live, created FROM posts"
+                    " WHERE app_id = ?",
+                    (row["id"],),
+                ).fetchone()
+                current = (row["name"], row["board"], row["offices"], int(row["live"]))
+                created = parse_created(row.get("created"))
+                if known is None:
+                    changed += 1
+                    self.db.execute(
+                        "INSERT INTO posts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            row["id"],
+                            job_id,
+                            *current[:3],
+                            parent,
+                            current[3],
+                            now,
+                            now,
+                            created,
+                        ),
+                    )
+                else:
+                    # Posts indexed before their dates were read, or first seen
+                    # without one, learn it the next time they are seen with one
+                    learned = known["created"] is None and created is not None
+                    changed += tuple(known)[:4] != current or learned
+                    self.db.execute(
+                        "UPDATE posts SET name = ?, board = ?, location = ?, live = ?,"
+                        " last_seen = ?, created = COALESCE(created, ?)"
+                        " WHERE app_id = ?",
+                        (*current, now, created, row["id"]),
+                    )
+            self.link_parents(job_id)
+        return changed
+
+    def link_parents(self, job_id):
+        # Duplicates carry the exact name of the parent post they were made
+        # from, which tells nothing when parents share it: those are left alone
+        protected = ", ".join("?" * len(JOB_BOARDS_PROTECTED))
+        self.db.execute(
+            dedent(
+                f"""
+                UPDATE posts SET parent = (
+                    SELECT MIN(p.app_id) FROM posts p
+                    WHERE p.job_id = posts.job_id AND p.name = posts.name
+                    AND p.board IN ({protected})
+                    HAVING COUNT(*) = 1
+                )
+                WHERE job_id = ? AND parent IS NULL AND board NOT IN ({protected})
+                """
+            ),
+            (*JOB_BOARDS_PROTECTED, job_id, *JOB_BOARDS_PROTECTED),
         )
 
-        if job_posts == job_post_offset:
-            break
+    def forget_unseen(self, job_id, seen_ids):
+        """Drop posts of a job that a full harvest did not come across."""
+        with self.db:
+            for post in self.posts(job_id):
+                if post.app_id not in seen_ids:
+                    self.remove(post.app_id)
+
+    def set_live(self, app_id, live):
+        with self.db:
+            self.db.execute(
+                "UPDATE posts SET live = ? WHERE app_id = ?", (int(live), app_id)
+            )
 
-        job_post = browser.find_element(
-            By.XPATH,
-            '//*[@id="job_applications"]/tbody/tr[' + str(job_post_offset + 1) + "]",
+    def remove(self, app_id):
+        with self.db:
+            self.db.execute("DELETE FROM posts WHERE app_id = ?", (app_id,))
+
+
+def parse_created(created):
+    if created:
+        return datetime.fromisoformat(created.replace("Z", "+00:00")).timestamp()
+
+
+###############################################################
+@dataclass
+class Post:
+    app_id: str
+    job_id: str
+    name: str
+    board: str
+    location: str
+    parent: str = None
+    live: bool = False
+    first_seen: float = None
+    last_seen: float = None
+    created: float = None
+
+    def __post_init__(self):
+        self.live = bool(self.live)
+
+    @property
+    def protected(self):
+        return self.board in JOB_BOARDS_PROTECTED
+
+    @property
+    def age(self):
+        """Days since the post was created, or first seen if Greenhouse did not
+        say when that was."""
+        return (time.time() - (self.created or self.first_seen)) / 86400
+
+
+class Inventory:
+    """The posts of one job, indexed by app id, name and location."""
+
+    def __init__(self, posts):
+        self.posts = list(posts)
+        self.by_id = {}
+        self.by_name = defaultdict(list)
+        self.by_location = defaultdict(list)
+        for post in self.posts:
+            self.by_id[post.app_id] = post
+            self.by_name[post.name].append(post)
+            self.by_location[post.location].append(post)
+
+    def parents(self):
+        return [post for post in self.posts if post.protected]
+
+    def locations(self, parent):
+        """Locations already covered by a parent post and its duplicates,
+        which share the parent's exact name."""
+        return {post.location for post in self.by_name[parent.name]}
+
+
+@dataclass
+class Plan:
+    job_id: str
+    # (parent post, location text) pairs
+    creates: list = field(default_factory=list)
+    deletes: list = field(default_factory=list)
+    publishes: list = field(default_factory=list)
+    # (parent post, post to replace with a new one) pairs
+    replaces: list = field(default_factory=list)
+
+
+def plan_job(job_id, inventory, args):
+    plan = Plan(job_id)
+
+    # Process updates for each `Canonical` job unless a limit arg is passed
+    if args.limit:
+        if args.limit not in inventory.by_id:
+            raise SystemExit(f"Post {args.limit} was not found under job {job_id}")
+        parents = [inventory.by_id[args.limit]]
+    else:
+        parents = inventory.parents()
+
+    if args.refresh_older_than is not None or (args.reset_all and args.limit):
+        warn_unknown_parents(inventory, parents)
+
+    if args.reset_all:
+        parent_ids = {parent.app_id for parent in parents}
+        plan.deletes = [
+            post
+            for post in inventory.posts
+            if not post.protected and (not args.limit or post.parent in parent_ids)
+        ]
+        return plan
+
+    if args.refresh_older_than is not None:
+        parent_ids = {parent.app_id for parent in parents}
+        plan.replaces = [
+            (inventory.by_id[post.parent], post)
+            for post in inventory.posts
+            if not post.protected
+            and post.parent in parent_ids
+            and post.age > args.refresh_older_than
+        ]
+
+    for parent in parents:
+        # Regions can overlap, each location is only created the once
+        existing = {location_key(text) for text in inventory.locations(parent)}
+        for region in args.regions or []:
+            for location_text in REGIONS[region]:
+                if location_key(location_text) not in existing:
+                    existing.add(location_key(location_text))
+                    plan.creates.append((parent, location_text))
+
+    # New posts go live as soon as they are saved. Drafts someone else left
+    # behind are only published when asked to, they may be drafts on purpose
+    if args.publish_all_drafts:
+        plan.publishes = [
+            post for post in inventory.posts if not post.protected and not post.live
+        ]
+    return plan
+
+
+def warn_unknown_parents(inventory, parents):
+    names = {parent.name for parent in parents}
+    for post in inventory.posts:
+        if not post.protected and post.parent is None and post.name in names:
+            print(
+                f"WARNING: post {post.app_id} in {post.location} could have been "
+                f"made from any parent post named '{post.name}', leaving it alone"
+            )
+
+
+def print_plan(plan):
+    print(f"[Plan for job {plan.job_id}]")
+    parent = None
+    for post, location_text in sorted(
+        plan.creates, key=lambda create: (create[0].app_id, create[1])
+    ):
+        if parent is None or post.app_id != parent.app_id:
+            parent = post
+            print(f'-> Create posts from "{parent.name}" ({parent.app_id})')
+        print(f"--> {location_text}")
+    for post in plan.deletes:
+        print(f"-> Delete '{post.name}' in {post.location} ({post.app_id})")
+    for post in plan.publishes:
+        print(f"-> Publish '{post.name}' in {post.location} ({post.app_id})")
+    for _, post in plan.replaces:
+        print(
+            f"-> Replace '{post.name}' in {post.location} "
+            f"({post.app_id}, {post.age:.0f} days old)"
         )
-        if job_post is None:
+    print(
+        f"-> {len(plan.creates)} to create, {len(plan.deletes)} to delete, "
+        f"{len(plan.publishes)} existing drafts to publish, "
+        f"{len(plan.replaces)} to replace"
+    )
+
+
+###############################################################
+class Journal:
+    """Append-only record of each step of a run, so --resume can carry on
+    from wherever a run that died stopped."""
+
+    def __init__(self, path=None):
+        if path is None:
+            path = os.path.join(user_data_dir("greenhouse"), "journal.jsonl")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.file = None
+        self.lock = threading.Lock()
+
+    def entries(self):
+        entries = []
+        try:
+            with open(self.path, "r") as f:
+                for line in f:
+                    entries.append(json.loads(line))
+        except FileNotFoundError:
+            pass
+        except json.JSONDecodeError:
+            # Only the last line can be cut short, by dying while writing it
+            pass
+        return entries
+
+    def unfinished(self):
+        entries = self.entries()
+        return bool(entries) and entries[-1]["step"] != "finished"
+
+    def start(self, argv):
+        if self.unfinished():
+            print("NOTE: discarding the journal of an unfinished run (see --resume)")
+        self.file = open(self.path, "w")
+        self.record("run", argv=argv)
+
+    def reopen(self):
+        self.file = open(self.path, "a")
+        self.record("resumed")
+
+    def record(self, step, **fields):
+        # Every step is on disk before the next one starts
+        with self.lock:
+            self.file.write(json.dumps(dict(step=step, time=time.time(), **fields)))
+            self.file.write("\n")
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def record_plan(self, plan):
+        self.record("plan", job=plan.job_id)
+        for parent, location_text in plan.creates:
+            self.record(
+                "planned",
+                action="create",
+                job=plan.job_id,
+                post=asdict(parent),
+                location=location_text,
+            )
+        for action, posts in (("delete", plan.deletes), ("publish", plan.publishes)):
+            for post in posts:
+                self.record(
+                    "planned", action=action, job=plan.job_id, post=asdict(post)
+                )
+        for parent, post in plan.replaces:
+            self.record(
+                "planned",
+                action="replace",
+                job=plan.job_id,
+                post=asdict(post),
+                parent=asdict(parent),
+            )
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+def resume_plans(run, entries):
+    """Rebuild the plan of each job from the journal, less the steps that were
+    already done."""
+    plans = {}
+    creates, in_flight, deletes, publishes = {}, set(), {}, {}
+    # Keyed like creates, by the location the replacement goes to
+    replaces, replaced = {}, {}
+    for entry in entries:
+        job_id = entry.get("job")
+        if entry["step"] == "plan":
+            plans[job_id] = Plan(job_id)
+        elif entry["step"] == "planned":
+            post = Post(**entry["post"])
+            if entry["action"] == "create":
+                creates[job_id, post.app_id, entry["location"]] = post
+            elif entry["action"] == "replace":
+                parent = Post(**entry["parent"])
+                replaces[job_id, parent.app_id, post.location] = (parent, post)
+            elif entry["action"] == "delete":
+                deletes[post.app_id] = post
+            else:
+                publishes[post.app_id] = post
+        elif entry["step"] == "creating":
+            in_flight.add((job_id, entry["parent"], entry["location"]))
+        elif entry["step"] == "created":
+            key = (job_id, entry["parent"], entry["location"])
+            in_flight.discard(key)
+            creates.pop(key, None)
+            row = entry["row"]
+            if key in replaces and row is not None:
+                replaced[key] = (replaces.pop(key)[1], row["id"])
+            if row is not None:
+                run.index.update(job_id, [row], parent=entry["parent"])
+                publishes[row["id"]] = Post(
+                    row["id"],
+                    job_id,
+                    row["name"],
+                    row["board"],
+                    row["offices"],
+                    entry["parent"],
+                )
+        elif entry["step"] == "deleted":
+            deletes.pop(entry["app_id"], None)
+            for key, (post, _) in list(replaced.items()):
+                if post.app_id == entry["app_id"]:
+                    del replaced[key]
+        elif entry["step"] == "published":
+            publishes.pop(entry["app_id"], None)
+
+    # A post that was being saved when the run died may or may not exist, only
+    # those jobs need looking at again
+    for job_id in {key[0] for key in in_flight}:
+        harvest(run.backend, run.index, job_id, full_harvest=True)
+        inventory = Inventory(run.index.posts(job_id))
+        for key in in_flight:
+            if key[0] != job_id:
+                continue
+            parent, old = creates.get(key), None
+            if key in replaces:
+                parent, old = replaces[key]
+            if parent is None:
+                continue
+            for post in inventory.by_name[parent.name]:
+                if (
+                    post.location != key[2]
+                    or post.protected
+                    or old
+                    and post.app_id == old.app_id
+                ):
+                    continue
+                creates.pop(key, None)
+                if not post.live:
+                    publishes[post.app_id] = post
+                if key in replaces:
+                    replaced[key] = (replaces.pop(key)[1], post.app_id)
+                break
+
+    # The post a replacement was made for goes once the replacement is live
+    for old, new_app_id in replaced.values():
+        if new_app_id not in publishes:
+            deletes[old.app_id] = old
+
+    for (job_id, _, location_text), parent in creates.items():
+        plans[job_id].creates.append((parent, location_text))
+    for post in deletes.values():
+        plans[post.job_id].deletes.append(post)
+    for post in publishes.values():
+        plans[post.job_id].publishes.append(post)
+    for (job_id, _, _), replace in replaces.items():
+        plans[job_id].replaces.append(replace)
+    return plans
+
+
+###############################################################
+def harvest(backend, index, job_id, full_harvest=False):
+    seen_ids = set()
+    # Without a full harvest, stop paginating at the first page that holds
+    # nothing we have not already got in the index, in the same place (posts
+    # are listed oldest first, like the index, so one deleted since the last
+    # run shifts those after it)
+    full_harvest = full_harvest or not index.has(job_id)
+    known_ids = [post.app_id for post in index.posts(job_id)]
+
+    print(f"[Harvesting job {job_id}]")
+    # Only a full harvest knows it wants every page up front
+    pages = backend.all_pages(job_id) if full_harvest else backend.pages(job_id)
+    for page in itertools.count(1):
+        with metrics.span("harvest page", job=job_id):
+            rows = next(pages, None)
+        if rows is None:
+            # Every page was read, so whatever was not on one is gone
+            index.forget_unseen(job_id, seen_ids)
+            break
+        print(f"-> Processing page {page}")
+        ids = [row["id"] for row in rows]
+        moved = ids != known_ids[len(seen_ids) : len(seen_ids) + len(ids)]
+        seen_ids.update(ids)
+        if not index.update(job_id, rows) and not moved and not full_harvest:
+            print("-> No changes since the last run, using the local index")
             break
 
-        job_post_board = job_post.find_element(By.CSS_SELECTOR, ".board-column").text
-        if job_post_board in JOB_BOARDS_PROTECTED:
-            job_post_offset += 1
-            continue
 
-        if "live" in job_post.get_attribute("class").split():
-            job_post_unpublish = job_post.find_element(
-                By.CSS_SELECTOR, ".unpublish-application-button"
+def delete_post(run, job_id, post):
+    run.backend.recycle_if_due()
+    try:
+        with metrics.span("delete", job=job_id):
+            attempt(
+                run,
+                run.backend,
+                f"deleting {post.location}",
+                run.backend.delete,
+                job_id,
+                post,
+                # Gone already, if the last attempt deleted it before failing
+                recover=lambda: run.backend.gone(job_id, post.app_id) or None,
             )
-            job_post_unpublish.click()
-            browser.find_element(By.LINK_TEXT, "Unpublish").click()
+    except run.backend.errors as e:
+        quarantine(run, job_id, f"deleting {post.app_id} in {post.location}", e)
+        return False
+    run.index.remove(post.app_id)
+    return True
+
+
+def delete_posts(run, plan):
+    job_id = plan.job_id
+    for post in plan.deletes:
+        print(f"Deleting post '{post.name}' from job {job_id} ...")
+        if delete_post(run, job_id, post):
+            run.journal.record("deleted", job=job_id, app_id=post.app_id)
+
+    if not run.args.reset_all:
+        return
+
+    # One more pass over the posts, to check only protected ones are left
+    harvest(run.backend, run.index, job_id, full_harvest=True)
+    inventory = Inventory(run.index.posts(job_id))
+    remaining = plan_job(job_id, inventory, run.args).deletes
+    for post in remaining:
+        print(f"WARNING: post '{post.name}' ({post.app_id}) is still there")
+    if not remaining:
+        print(f"-> Only protected posts remain under job {job_id}")
+
+
+def replace_posts(run, plan):
+    job_id = plan.job_id
+    print(f"[Replacing posts older than {run.args.refresh_older_than:g} days]")
+    for parent, post in plan.replaces:
+        location_text = post.location
+        print(f"--> Replacing {location_text} ({post.app_id})")
+        run.backend.recycle_if_due()
+        # The new post goes live before the old one goes, so the location is
+        # never left without one
+        step = dict(job=job_id, parent=parent.app_id, location=location_text)
+        run.journal.record("creating", **step)
+        try:
+            with metrics.span("create", job=job_id, location=location_text):
+                row = create_post_with_retries(
+                    run, run.backend, job_id, parent, location_text, skip={post.app_id}
+                )
+        except run.backend.errors as e:
+            quarantine(run, job_id, f"{location_text} from {parent.app_id}", e)
+            continue
+        run.journal.record("created", row=row, **step)
 
-        job_post_name = job_post.find_element(
-            By.CSS_SELECTOR, ".job-application__name"
-        ).text.replace("\n", " ")
-        print(f"Deleting post '{job_post_name}' from job {job_id} ...")
+        row, published = publish_post(
+            run, run.backend, job_id, parent, location_text, row
+        )
+        run.results["created"].append((job_id, parent.app_id, location_text, row))
+        if not published:
+            print(f"--> Keeping {post.app_id}, its replacement is not live")
+            continue
 
-        # Click options menu (Delete/Duplicate)
-        job_post.find_element(By.XPATH, "td[3]/div/div[1]").click()
-        job_post.find_element(By.XPATH, "td[3]/div/div[2]/span/a").click()
-        browser.find_element(By.XPATH, '//*[@id="confirm-delete-post"]').click()
-        time.sleep(0.2)
+        if delete_post(run, job_id, post):
+            run.journal.record("deleted", job=job_id, app_id=post.app_id)
+
+
+def publish_drafts(run, plan):
+    print("[Marking existing draft posts live]")
+    for post in plan.publishes:
+        print(f"-> Publishing '{post.name}' in {post.location}")
+        run.backend.recycle_if_due()
+        try:
+            with metrics.span("publish", job=plan.job_id):
+                attempt(
+                    run,
+                    run.backend,
+                    f"publishing {post.location}",
+                    run.backend.publish,
+                    plan.job_id,
+                    post.app_id,
+                )
+        except run.backend.errors as e:
+            quarantine(
+                run, plan.job_id, f"publishing {post.app_id} in {post.location}", e
+            )
+            continue
+        run.index.set_live(post.app_id, True)
+        run.journal.record("published", job=plan.job_id, app_id=post.app_id)
 
 
 ###############################################################
-def parse_args():
+def add_recycle_arguments(parser):
+    parser.add_argument(
+        "--recycle-pages",
+        type=int,
+        default=500,
+        metavar="N",
+        help="Replace a browser with a new one, signed in with the same session, "
+        "after it has loaded N pages (default is 500)",
+    )
+    parser.add_argument(
+        "--recycle-memory",
+        type=float,
+        default=3000,
+        metavar="MB",
+        help="Replace a browser with a new one, signed in with the same session, "
+        "once its processes use more than MB megabytes (default is 3000)",
+    )
+
+
+def add_session_arguments(parser):
+    """The options for getting a signed-in backend, shared by every command."""
+    parser.add_argument(
+        "--browser",
+        choices=["chrome", "firefox"],
+        default="chrome",
+        help="The browser to use (default is chrome)",
+    )
+    parser.add_argument(
+        "--lean",
+        action="store_true",
+        help="Keep the browser from loading images, fonts, media and trackers, "
+        "and from waiting on them before carrying on",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["selenium", "http"],
+        default="selenium",
+        help="Drive the Greenhouse UI in a browser, or talk to it over plain "
+        "HTTP using the saved session (default is selenium)",
+    )
+    parser.add_argument(
+        "--headless", action="store_true", help="Run the automation without the GUI"
+    )
+    parser.add_argument(
+        "--fresh-login",
+        action="store_true",
+        help="Ignore the saved Greenhouse session and sign in through SSO again",
+    )
+    add_recycle_arguments(parser)
+
+
+def add_pacing_arguments(parser, items):
+    """The options for how many of the items (posts, applications) to work on
+    at once, and how hard to try each of them."""
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help=f"Number of browser sessions working on {items} in parallel "
+        "(default is 1)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=0,
+        help=f"With --backend http, work on up to this many {items} at once "
+        "using asyncio",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=10,
+        help="With --concurrency, the most requests per second to send to "
+        "Greenhouse (default is 10)",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=2,
+        help=f"Times to retry one of the {items} after a transient error, "
+        "backing off exponentially, before it is quarantined (default is 2)",
+    )
+
+
+def parse_args(argv=None):
     # print("Inside: parse_args()")
     parser = argparse.ArgumentParser(
         description="Duplicate Greenhouse job postings to multiple locations."
     )
     parser.add_argument(
         "job_ids",
-        nargs="+",
+        nargs="*",
         help="The numeric Greenhouse job id (the number in the URL when on the Job Dashboard)",
     )
     parser.add_argument(
@@ -343,31 +1252,115 @@ def parse_args():
         help="The regions in which to create job postings",
     )
 
+    add_session_arguments(parser)
+
     parser.add_argument(
-        "--browser",
-        dest="browser",
-        choices=["chrome", "firefox"],
-        default="chrome",
-        help="The browser to use (default is chrome)",
+        "--reset-all",
+        action="store_true",
+        help="Delete ALL posts under a given job_id, or only the duplicates of "
+        "the --limit post",
     )
 
     parser.add_argument(
-        "--reset-all",
+        "--limit", dest="limit", help="The specific job post to clone inside a REQ"
+    )
+
+    parser.add_argument(
+        "--full-harvest",
         action="store_true",
-        help="Delete ALL posts under a given job_id (no --limit support)",
+        help="Read every page of job posts instead of trusting the local index",
     )
 
     parser.add_argument(
-        "--headless", action="store_true", help="Run the automation without the GUI"
+        "--refresh-older-than",
+        type=float,
+        metavar="DAYS",
+        help="Replace the duplicated posts created more than DAYS ago with new "
+        "ones, one location at a time, to top-post them again",
     )
 
     parser.add_argument(
-        "--limit", dest="limit", help="The specific job post to clone inside a REQ"
+        "--publish-all-drafts",
+        action="store_true",
+        help="Also publish draft posts this run did not create",
+    )
+
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Print what would be created, deleted and published, using the "
+        "local index, without starting a browser",
+    )
+
+    add_pacing_arguments(parser, "posts")
+
+    parser.add_argument(
+        "--metrics",
+        metavar="FILE",
+        help="Append a JSON line to FILE for every timed phase of the run",
+    )
+
+    parser.add_argument(
+        "--prometheus",
+        metavar="FILE",
+        help="Write the run's timings to FILE in the Prometheus textfile format",
+    )
+
+    parser.add_argument(
+        "--warm-locations",
+        action="store_true",
+        help="Look up the publish location suggestion for every location of "
+        "--region on the job's duplicate form and remember them, without "
+        "creating any posts",
+    )
+
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Keep signed-in browsers (--workers of them) running, and carry out "
+        "the commands sent with --connect",
+    )
+
+    parser.add_argument(
+        "--connect",
+        action="store_true",
+        help="Have the daemon started with --serve carry out this command",
+    )
+
+    parser.add_argument(
+        "--socket",
+        metavar="PATH",
+        help="The Unix socket --serve listens on and --connect talks to",
+    )
+
+    parser.add_argument(
+        "--recycle-after",
+        type=float,
+        default=60,
+        metavar="MINUTES",
+        help="With --serve, replace the browsers once they have been running "
+        "this long (default is 60)",
+    )
+
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Carry on with the last run, if it was interrupted, skipping the "
+        "steps it already did",
     )
 
     # arg parsing debug
     # print(vars(parser.parse_args()))
-    return parser.parse_args()
+    args = parser.parse_args(argv)
+    if args.refresh_older_than is not None and args.reset_all:
+        parser.error("--refresh-older-than and --reset-all do not go together")
+    if args.warm_locations and (args.backend != "selenium" or not args.regions):
+        parser.error("--warm-locations needs --backend selenium and --region")
+    if not args.job_ids and not (args.resume or args.serve):
+        parser.error("the following arguments are required: job_ids")
+    if args.concurrency and args.backend != "http":
+        parser.error("--concurrency needs --backend http")
+    return args
 
 
 ###############################################################
@@ -386,9 +1379,69 @@ def remove_tooltips(browser):
     )
 
 
-def main():
-    args = parse_args()
+# What --lean keeps the browser from fetching: images, fonts, media, and the
+# analytics and tracking scripts loaded by the Greenhouse pages
+LEAN_BLOCKED_URLS = [
+    "*.png",
+    "*.jpg",
+    "*.jpeg",
+    "*.gif",
+    "*.svg",
+    "*.webp",
+    "*.woff",
+    "*.woff2",
+    "*.ttf",
+    "*.otf",
+    "*.mp3",
+    "*.mp4",
+    "*.webm",
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*doubleclick.net*",
+    "*hotjar.com*",
+    "*segment.com*",
+    "*segment.io*",
+    "*fullstory.com*",
+    "*pendo.io*",
+    "*intercom.io*",
+    "*nr-data.net*",
+    "*newrelic.com*",
+]
+
+LEAN_CHROME_ARGUMENTS = [
+    "--disable-background-timer-throttling",
+    "--disable-backgrounding-occluded-windows",
+    "--disable-renderer-backgrounding",
+    "--disable-component-update",
+    "--mute-audio",
+    "--disk-cache-size=33554432",
+    "--media-cache-size=1",
+]
+
+LEAN_FIREFOX_PREFS = {
+    "permissions.default.image": 2,
+    "gfx.downloadable_fonts.enabled": False,
+    "media.autoplay.default": 5,
+    "privacy.trackingprotection.enabled": True,
+    "dom.min_background_timeout_value": 4,
+    "dom.timeout.enable_budget_throttling": False,
+    "browser.cache.disk.capacity": 32768,
+    "browser.cache.memory.capacity": 16384,
+}
 
+
+def make_firefox(args):
+    options = FirefoxOptions()
+    if args.headless:
+        options.add_argument("-headless")
+    if args.lean:
+        options.page_load_strategy = "eager"
+        for name, value in LEAN_FIREFOX_PREFS.items():
+            options.set_preference(name, value)
+    return webdriver.Firefox(options=options)
+
+
+def make_browser(args):
     options = Options()
 
     prefs = {
@@ -412,219 +1465,1938 @@ def main():
         options.add_argument("disable-infobars")
         options.add_argument("--disable-extensions")
 
+    if args.lean:
+        # Only wait for the DOM, the readiness checks cover the rest
+        options.page_load_strategy = "eager"
+        options.add_experimental_option("prefs", prefs)
+        for argument in LEAN_CHROME_ARGUMENTS:
+            options.add_argument(argument)
+
     if args.browser == "firefox":
-        browser = webdriver.Firefox()
+        browser = make_firefox(args)
     else:
         browser = webdriver.Chrome(options=options)
+        if args.lean:
+            browser.execute_cdp_cmd("Network.enable", {})
+            browser.execute_cdp_cmd(
+                "Network.setBlockedURLs", {"urls": LEAN_BLOCKED_URLS}
+            )
     browser.maximize_window()
+    return browser
+
+
+def process_memory(pid):
+    """The memory used by a process and all of its children, in MB, going by
+    their proportional set sizes so pages they share count once. None where
+    there is no /proc to ask."""
+    if not os.path.isdir("/proc"):
+        return None
+    children = defaultdict(list)
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The parent pid comes after the command name, which is in
+                # brackets and may hold spaces of its own
+                parent = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        children[parent].append(int(entry))
+
+    kilobytes, tree = 0, [pid]
+    while tree:
+        pid = tree.pop()
+        tree.extend(children[pid])
+        try:
+            with open(f"/proc/{pid}/smaps_rollup") as f:
+                for line in f:
+                    if line.startswith("Pss:"):
+                        kilobytes += int(line.split()[1])
+        except OSError:
+            continue
+    return kilobytes / 1024
 
-    sso_authenticate(browser, args)
 
-    for job_id in args.job_ids:
-        job_posts_page_url = f"{gh_url}/plans/{job_id}/jobapp"
-        browser.get(job_posts_page_url)
-        wait = ui.WebDriverWait(browser, 60)  # timeout after 60 seconds
+###############################################################
+# The publish location autocomplete's suggestions for a location, best first:
+# the one picked before, then the one named exactly after the city, then the
+# rest in the order offered. Ids come from jQuery UI's item data, if any.
+LOCATION_SUGGESTIONS_JS = dedent(
+    """
+    const suggestions = (text, wanted) => {
+        const rank = (item) =>
+            item.label === wanted ? 0
+            : item.label === text ? 1
+            : item.label.startsWith(text + ",") ? 2
+            : 3
+        return Array.from(document.querySelectorAll("ul.ui-menu li.ui-menu-item"))
+            .filter((elem) => elem.textContent.includes(text))
+            .map((elem, order) => {
+                const data = window.jQuery && jQuery(elem).data("ui-autocomplete-item")
+                const id = (data && (data.id || data.value)) || elem.dataset.id || null
+                return {elem, order, label: elem.textContent.trim(), id}
+            })
+            .sort((a, b) => rank(a) - rank(b) || a.order - b.order)
+    }
+    """
+)
+
+# Fill in the whole duplicate form in one WebDriver round trip. Values are set
+# through the native setter and announced with input/change events, so the
+# form's framework sees them as typed. Calls back with the job name, or with
+# the fields it could not find or that did not keep their value, so the
+# keystroke path can take over.
+FILL_DUPLICATE_FORM_JS = LOCATION_SUGGESTIONS_JS + dedent(
+    """
+    const [jobBoard, locationText, publishLocationText, wanted, timeout, done] = arguments
+    const label = (text) => Array.from(document.querySelectorAll("label"))
+        .find((elem) => elem.firstChild && elem.firstChild.textContent.trim() === text)
+    const field = (text) => {
+        const elem = label(text)
+        return elem && elem.parentElement.querySelector("input")
+    }
+    const checkbox = (text) => {
+        const elem = label(text)
+        return elem && elem.querySelector("input")
+    }
+    const setValue = (input, value) => {
+        const setter = Object.getOwnPropertyDescriptor(HTMLInputElement.prototype, "value").set
+        setter.call(input, value)
+        input.dispatchEvent(new Event("input", {bubbles: true}))
+        input.dispatchEvent(new Event("change", {bubbles: true}))
+    }
+    const tick = (input) => { if (!input.checked) input.click() }
+
+    const jobName = document.querySelector('input[class*="Input__InputElem-sc-ipbxf8-0"]')
+    const postTo = field("Post To")
+    const location = field("Location")
+    const publishLocation = document.querySelector('input[placeholder="Select location"]')
+    const remote = checkbox("Remote")
+    const missing = Object.entries({jobName, postTo, location, publishLocation, remote})
+        .filter(([name, elem]) => !elem).map(([name, elem]) => name)
+    if (missing.length) return done({missing: missing.join(", ")})
+
+    const name = jobName.value.replace("Copy of ", "").trim()
+    setValue(jobName, name)
+    setValue(postTo, jobBoard)
+    postTo.dispatchEvent(new KeyboardEvent("keydown", {key: "Enter", keyCode: 13, bubbles: true}))
+    setValue(location, locationText)
+    const indeed = checkbox("Indeed")
+    if (indeed) tick(indeed)
+    tick(remote)
+
+    // The publish location only takes a value picked from its autocomplete
+    setValue(publishLocation, wanted || publishLocationText)
+    const started = Date.now()
+    const pick = () => {
+        const items = suggestions(publishLocationText, wanted)
+        if (items.length) {
+            items[0].elem.click()
+            // Give the form a moment to react to the events, it may reset fields
+            setTimeout(() => {
+                const lost = Object.entries({
+                    postTo: postTo.value === jobBoard,
+                    location: location.value === locationText,
+                    remote: remote.checked,
+                    publishLocation: publishLocation.value.trim() === items[0].label,
+                }).filter(([name, kept]) => !kept).map(([name, kept]) => name)
+                if (lost.length) return done({missing: lost.join(", ")})
+                done({
+                    jobName: name,
+                    indeed: Boolean(indeed),
+                    suggestion: {label: items[0].label, id: items[0].id},
+                    candidates: items.length,
+                })
+            }, 100)
+        } else if (Date.now() - started > timeout) {
+            done({missing: "publishLocation suggestion"})
+        } else {
+            setTimeout(pick, 100)
+        }
+    }
+    pick()"""
+)
+
+
+# Type a location into the publish location field and report what the
+# autocomplete offers for it, without picking any
+RESOLVE_LOCATION_JS = LOCATION_SUGGESTIONS_JS + dedent(
+    """
+    const [publishLocationText, wanted, timeout, done] = arguments
+    const input = document.querySelector('input[placeholder="Select location"]')
+    const setter = Object.getOwnPropertyDescriptor(HTMLInputElement.prototype, "value").set
+    setter.call(input, "")
+    input.dispatchEvent(new Event("input", {bubbles: true}))
+    setter.call(input, publishLocationText)
+    input.dispatchEvent(new Event("input", {bubbles: true}))
+    const started = Date.now()
+    const check = () => {
+        const items = suggestions(publishLocationText, wanted)
+        if (items.length || Date.now() - started > timeout) {
+            done(items.map((item) => ({label: item.label, id: item.id})))
+        } else {
+            setTimeout(check, 100)
+        }
+    }
+    check()"""
+)
 
-        if args.reset_all:
-            delete_posts(browser, wait, job_id)
-            break
 
-        multipage = False
-        page = 1
-        existing_ids = []
-        existing_types = []
-        existing_names = []
-        existing_locations = []
+def publish_location_of(location_text):
+    return CATALOG.publish_label(location_text)
 
-        print(f"[Harvesting job details]")
-        while True:
-            print(f"-> Processing page {page}")
-            time.sleep(3.5)
-            remove_tooltips(browser)
-
-            # Ensure page navigation and job details have had sufficient time to load
-            job_locations = wait.until(
-                lambda browser: browser.find_elements(
-                    By.CLASS_NAME, "job-application__offices"
+
+def fill_duplicate_form(browser, job_id, location_text, locations):
+    with metrics.span("fill form", job=job_id, location=location_text):
+        try:
+            filled = browser.execute_async_script(
+                FILL_DUPLICATE_FORM_JS,
+                JOB_BOARD,
+                location_text,
+                publish_location_of(location_text),
+                locations.label(location_text),
+                20000,
+            )
+        except (
+            selenium.common.exceptions.JavascriptException,
+            # What a script that never calls back raises
+            selenium.common.exceptions.TimeoutException,
+        ) as e:
+            # The page is not what the script expects, it may still be typed in
+            print(
+                f"INFO: filling in the form failed ({e.__class__.__name__}), typing it"
+            )
+            return None
+    if "missing" in filled:
+        print(f"INFO: could not fill in {filled['missing']}, typing the form instead")
+        return None
+    if not filled["indeed"]:
+        print("INFO: Indeed board not available at the moment")
+    locations.resolved(location_text, filled["suggestion"], filled["candidates"])
+    return filled["jobName"]
+
+
+def type_duplicate_form(browser, ready, job_id, location_text, locations):
+    # Typing the whole suggestion picked before narrows the menu down to it
+    publish_location_text = locations.label(location_text) or publish_location_of(
+        location_text
+    )
+
+    browser.refresh()
+    job_name_txt = ready.until("duplicate form hydrated")[0]
+    job_name = job_name_txt.get_attribute("value").replace("Copy of ", "").strip()
+
+    job_name_txt.clear()
+    job_name_txt.send_keys(job_name)
+
+    post_to = browser.find_element(By.XPATH, '//label[text()="Post To"]/..//input[1]')
+    post_to.send_keys(JOB_BOARD)
+    post_to.send_keys(Keys.ENTER)
+
+    location = browser.find_elements(
+        By.XPATH, '//label[text()="Location"]/..//input[1]'
+    )[0]
+    location.clear()
+    location.send_keys(location_text)
+
+    ## Publish the posts out to our external partner sites
+    # try:
+    #     browser.find_elements(By.XPATH, '//label[text()="Glassdoor"]/input[1]')[0].click()
+    # except:
+    #     print("INFO: Glassdoor board not available at the moment")
+
+    indeed = browser.find_elements(By.XPATH, '//label[text()="Indeed"]/input[1]')
+    if indeed:
+        indeed[0].click()
+    else:
+        print("INFO: Indeed board not available at the moment")
+
+    publish_location = browser.find_elements(
+        By.XPATH, '//input[@placeholder="Select location"]'
+    )[0]
+    publish_location.clear()
+    with metrics.span("autocomplete", job=job_id, location=location_text):
+        publish_location.send_keys(publish_location_text)
+        ready.until("autocomplete menu open", text=publish_location_text)
+    publish_location.send_keys(Keys.DOWN)
+    publish_location.send_keys(Keys.TAB)
+
+    remote = browser.find_elements(By.XPATH, '//label[text()="Remote"]/input[1]')[0]
+    remote.click()
+    ready.until("checkbox ticked", checkbox=remote)
+    return job_name
+
+
+def create_post(
+    browser, ready, job_id, canonical_job_id, location_text, locations, skip=()
+):
+    with metrics.span("form load", job=job_id):
+        browser.get(
+            f"{gh_url}/plans/{job_id}/jobapps/new?from=duplicate&amp;greenhouse_job_application_id={canonical_job_id}"
+        )
+        ready.until("duplicate form hydrated")
+        remove_tooltips(browser)
+
+    job_name = fill_duplicate_form(browser, job_id, location_text, locations)
+    if job_name is None:
+        # Start over on a fresh copy of the form, and type it in key by key
+        job_name = type_duplicate_form(browser, ready, job_id, location_text, locations)
+
+    # click the Save button
+    save_btn = browser.find_elements(By.XPATH, '//a[text()="Save"]')[0]
+    with metrics.span("save", job=job_id, location=location_text):
+        save_btn.click()
+        ready.until("job_applications table rendered")
+
+        # Saving lands back on the job posts table, the newest match is our post
+        rows, _ = read_job_table(browser)
+    matches = [
+        row
+        for row in rows
+        if row["name"] == job_name
+        and row["offices"] == location_text
+        and row["id"] not in skip
+    ]
+    if matches:
+        return max(matches, key=lambda row: int(row["id"]))
+
+
+###############################################################
+class Backend:
+    """How the job post operations are carried out against Greenhouse.
+
+    Rows are the records READ_JOB_TABLE_JS returns for #job_applications.
+    """
+
+    # Failures of a single post that should not bring down the whole run
+    errors = ()
+
+    def classify(self, error):
+        """Whether one of the errors is worth another "retry", should
+        "quarantine" the post it happened to, or is "fatal" to the run."""
+        return "retry"
+
+    def find_post(self, job_id, name, location_text, skip=(), pace=None):
+        """The row of the newest duplicate of the named parent in a location,
+        if any, other than the posts in skip."""
+        matches = [
+            row
+            for rows in self.pages(job_id, pace)
+            for row in rows
+            if row["name"] == name
+            and row["offices"] == location_text
+            and row["board"] not in JOB_BOARDS_PROTECTED
+            and row["id"] not in skip
+        ]
+        if matches:
+            return max(matches, key=lambda row: int(row["id"]))
+
+    def gone(self, job_id, app_id):
+        return not any(
+            row["id"] == app_id for rows in self.pages(job_id) for row in rows
+        )
+
+    # Pages of posts that can be read at the same time
+    concurrent_pages = 1
+
+    def page(self, job_id, page):
+        """The rows on a page of a job's posts, and whether there is another."""
+        raise NotImplementedError
+
+    def pages(self, job_id, pace=None):
+        """Yield the rows of each page of a job's posts, in order, calling pace
+        (if given) before reading each of them."""
+        for page in itertools.count(1):
+            if pace is not None:
+                pace()
+            rows, has_next_page = self.page(job_id, page)
+            yield rows
+            if not has_next_page:
+                return
+
+    def all_pages(self, job_id):
+        """Like pages(), reading as many pages at once as the backend can."""
+        if self.concurrent_pages == 1:
+            yield from self.pages(job_id)
+            return
+        with ThreadPoolExecutor(max_workers=self.concurrent_pages) as executor:
+            for first in itertools.count(1, self.concurrent_pages):
+                batch = executor.map(
+                    lambda page: self.page(job_id, page),
+                    range(first, first + self.concurrent_pages),
                 )
+                for rows, has_next_page in batch:
+                    yield rows
+                    if not has_next_page:
+                        return
+
+    def duplicate(self, job_id, parent, location_text, skip=()):
+        """Clone the parent Post to a location, returning the new row, which
+        is none of the posts in skip (say one it replaces in that location)."""
+        raise NotImplementedError
+
+    def delete(self, job_id, post):
+        raise NotImplementedError
+
+    def publish(self, job_id, app_id):
+        raise NotImplementedError
+
+    def reject(self, app_id, reason, notes, template):
+        """Reject an application, emailing the candidate the template."""
+        raise NotImplementedError
+
+    def workers(self, count):
+        """Backends that can run alongside this one, sharing its session."""
+        raise NotImplementedError
+
+    def recycle_if_due(self):
+        """Start afresh, in between posts, if the backend has grown too big."""
+
+    def merge(self, worker):
+        pass
+
+    def summary(self):
+        return ""
+
+    def close(self):
+        pass
+
+
+# Choose the rejection reason, notes and email template the way
+# app-review.tm.js does, returning the option text missing from the form if any
+CHOOSE_REJECTION_JS = """
+function choose(id, text) {
+    const select = document.getElementById(id)
+    const index = [...select.options].findIndex(option => option.text === text)
+    if (index < 0) {
+        return false
+    }
+    select.selectedIndex = index
+    select.dispatchEvent(new Event("change", {bubbles: true}))
+    // The chosen.js dropdown drawn over the select follows it on this event
+    if (window.jQuery) {
+        jQuery(select).trigger("liszt:updated")
+    }
+    return true
+}
+
+const [reason, notes, template] = arguments
+if (!choose("rejection_reason", reason)) {
+    return reason
+}
+document.getElementById("rejection_reason_note").value = notes
+if (!choose("rejection_template_chooser", template)) {
+    return template
+}
+return null
+"""
+
+
+class SeleniumBackend(Backend):
+    """Drive the Greenhouse UI in a browser."""
+
+    def __init__(self, args, cookies=None, locations=None):
+        load_selenium()
+        self.args = args
+        self.errors = (IndexError, selenium.common.exceptions.WebDriverException)
+        self.locations = locations or LocationCache()
+        self.browser = make_browser(args)
+        self.ready = Readiness(self.browser)
+        self.page_loads = 0
+        if cookies is None:
+            authenticate(self.browser, self.ready, args)
+        else:
+            share_session(self.browser, cookies)
+
+    def get(self, url):
+        self.page_loads += 1
+        self.browser.get(url)
+
+    def recycle_if_due(self):
+        if self.page_loads >= self.args.recycle_pages:
+            self.recycle(f"{self.page_loads} page loads")
+            return
+        memory = process_memory(self.browser.service.process.pid)
+        if memory is not None and memory > self.args.recycle_memory:
+            self.recycle(f"growing to {memory:.0f} MB")
+
+    def recycle(self, reason):
+        # A browser grows with every page it loads until its waits time out,
+        # a new one signed in with the same cookies carries on where it was
+        print(f"[Recycling the browser after {reason}]")
+        with metrics.span("recycle"):
+            cookies = self.browser.get_cookies()
+            self.close()
+            self.browser = make_browser(self.args)
+            self.ready.browser = self.browser
+            share_session(self.browser, cookies)
+        self.page_loads = 0
+
+    def page(self, job_id, page):
+        self.get(f"{gh_url}/plans/{job_id}/jobapp?page={page}&per_page={PAGE_SIZE}")
+        # Ensure job details have had sufficient time to load
+        self.ready.until("job_applications table rendered")
+        remove_tooltips(self.browser)
+        return read_job_table(self.browser)
+
+    def find_row(self, job_id, app_id):
+        xpath = (
+            f'//*[@id="job_applications"]/tbody/tr[.//a[contains(@class, "job-edit-pencil")'
+            f' and contains(@href, "/jobapps/{app_id}/")]]'
+        )
+        # Stay on the page of posts already loaded for as long as it has the
+        # post, and only go looking through the pages again once it does not
+        rows = self.browser.find_elements(By.XPATH, xpath)
+        if not rows:
+            for page in self.pages(job_id):
+                if any(row["id"] == app_id for row in page):
+                    rows = self.browser.find_elements(By.XPATH, xpath)
+                    break
+        if not rows:
+            raise selenium.common.exceptions.NoSuchElementException(
+                f"Post {app_id} is not under job {job_id}"
+            )
+        return rows[0]
+
+    def classify(self, error):
+        # Without a browser to drive, no other post stands a chance either
+        if isinstance(
+            error,
+            (
+                selenium.common.exceptions.InvalidSessionIdException,
+                selenium.common.exceptions.NoSuchWindowException,
+            ),
+        ):
+            return "fatal"
+        return "retry"
+
+    def click(self, element):
+        if self.args.lean:
+            # With images blocked the publish toggles can be left with no
+            # size to click on
+            self.browser.execute_script("arguments[0].click()", element)
+        else:
+            element.click()
+
+    def duplicate(self, job_id, parent, location_text, skip=()):
+        # The form, and the job posts it lands back on once saved
+        self.page_loads += 2
+        row = create_post(
+            self.browser,
+            self.ready,
+            job_id,
+            parent.app_id,
+            location_text,
+            self.locations,
+            skip,
+        )
+        if row is None:
+            # Saving lands on the first page of posts, and new ones are listed
+            # last, so past a page of them it has to be looked for
+            row = self.find_post(job_id, parent.name, location_text, skip)
+        return row
+
+    def warm_locations(self, job_id, parent, location_texts):
+        # One copy of the form will do for asking about every location, it is
+        # never saved
+        self.get(
+            f"{gh_url}/plans/{job_id}/jobapps/new?from=duplicate&amp;greenhouse_job_application_id={parent.app_id}"
+        )
+        self.ready.until("duplicate form hydrated")
+        remove_tooltips(self.browser)
+        for location_text in location_texts:
+            with metrics.span("autocomplete", job=job_id, location=location_text):
+                candidates = self.browser.execute_async_script(
+                    RESOLVE_LOCATION_JS,
+                    publish_location_of(location_text),
+                    self.locations.label(location_text),
+                    20000,
+                )
+            if candidates:
+                self.locations.resolved(location_text, candidates[0], len(candidates))
+                print(f"--> {location_text}: {candidates[0]['label']}")
+            else:
+                print(f"--> {location_text}: NOTHING OFFERED")
+
+    def delete(self, job_id, post):
+        job_post = self.find_row(job_id, post.app_id)
+
+        if post.live:
+            job_post_unpublish = job_post.find_element(
+                By.CSS_SELECTOR, ".unpublish-application-button"
+            )
+            self.click(job_post_unpublish)
+            self.ready.until("unpublish confirmation open")[0].click()
+
+        # Click options menu (Delete/Duplicate)
+        job_post.find_element(By.XPATH, "td[3]/div/div[1]").click()
+        job_post.find_element(By.XPATH, "td[3]/div/div[2]/span/a").click()
+        self.ready.until("delete confirmation open")[0].click()
+        self.ready.until("post removed", row=job_post)
+
+    def publish(self, job_id, app_id):
+        ## Click the "Enable" button on the post, to make it live
+        row = self.find_row(job_id, app_id)
+        self.click(row.find_element(By.CSS_SELECTOR, "img.publish-application-button"))
+        self.ready.until("post published", row=row)
+
+    def reject(self, app_id, reason, notes, template):
+        self.get(f"{gh_url}/application_review?application_id={app_id}")
+        self.click(self.ready.until("reject button shown")[0])
+        self.ready.until("rejection form open")
+        missing = self.browser.execute_script(
+            CHOOSE_REJECTION_JS, reason, notes, template
+        )
+        if missing:
+            raise selenium.common.exceptions.NoSuchElementException(
+                f"The rejection form has no option '{missing}'"
             )
-            job_names = browser.find_elements(By.CLASS_NAME, "job-application__name")
-            job_ids = browser.find_elements(By.CLASS_NAME, "job-edit-pencil")
-            job_types = browser.find_elements(By.CLASS_NAME, "board-column")
-
-            # harvest job details from each page of results
-            existing_types += [result.text for result in job_types]
-            existing_ids += [
-                result.get_attribute("href").split("/")[4] for result in job_ids
+        button = self.ready.until("rejection email ready")[0]
+        self.click(button)
+        self.ready.until("rejection sent", element=button)
+
+    def workers(self, count):
+        cookies = self.browser.get_cookies()
+        with ThreadPoolExecutor(max_workers=max(count, 1)) as executor:
+            futures = [
+                executor.submit(SeleniumBackend, self.args, cookies, self.locations)
+                for _ in range(count)
             ]
-            existing_names += [result.text.split("\n")[0] for result in job_names]
-            existing_locations += [result.text.strip("()") for result in job_locations]
+        started = [future.result() for future in futures if not future.exception()]
+        if len(started) < count:
+            # None of the browsers that did start may be left behind
+            for worker in started:
+                worker.close()
+            raise next(future.exception() for future in futures if future.exception())
+        return started
+
+    def merge(self, worker):
+        for name, seconds in worker.ready.waited.items():
+            self.ready.waited[name] += seconds
+
+    def summary(self):
+        return self.ready.summary()
+
+    def close(self):
+        try:
+            self.browser.quit()
+        except (
+            selenium.common.exceptions.WebDriverException,
+            urllib3.exceptions.HTTPError,
+        ):
+            pass
+        finally:
+            # A browser that crashed or hung can leave its driver running
+            process = self.browser.service.process
+            if process is not None and process.poll() is None:
+                process.kill()
 
-            next_page = browser.find_elements(By.CLASS_NAME, "next_page")
-            if not next_page:
-                break
 
-            if "disabled" not in next_page[0].get_attribute("class"):
-                multipage = True
-                page += 1
-                next_page[0].click()
+###############################################################
+class JobTableParser(HTMLParser):
+    """Read the rows of #job_applications out of a job posts page, giving the
+    same records as READ_JOB_TABLE_JS."""
+
+    FIELDS = {
+        "job-application__name": "name",
+        "board-column": "board",
+        "job-application__offices": "offices",
+    }
+    LINE_BREAKS = {"br", "div", "li", "p"}
+    VOID_TAGS = {"area", "br", "col", "hr", "img", "input", "link", "meta", "wbr"}
+
+    def __init__(self):
+        super().__init__()
+        self.rows = []
+        self.has_next_page = False
+        self.csrf_token = None
+        self.stack = []
+        self.table_depth = None
+        self.row = None
+        self.row_depth = None
+        self.field = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        classes = (attrs.get("class") or "").split()
+        if tag == "meta" and attrs.get("name") == "csrf-token":
+            self.csrf_token = attrs.get("content")
+        elif "next_page" in classes:
+            self.has_next_page = "disabled" not in classes
+
+        if self.field and tag in self.LINE_BREAKS:
+            self.row[self.field[0]] += "\n"
+        if tag in self.VOID_TAGS:
+            return
+
+        self.stack.append(tag)
+        depth = len(self.stack)
+        if tag == "table" and attrs.get("id") == "job_applications":
+            self.table_depth = depth
+        elif (
+            tag == "tr"
+            and self.table_depth
+            and "tbody" in self.stack[self.table_depth :]
+        ):
+            self.row_depth = depth
+            self.row = {
+                "id": None,
+                "name": "",
+                "board": "",
+                "offices": "",
+                "live": "live" in classes,
+                "draft": "draft" in classes,
+                "external": "external" in classes,
+                "created": None,
+            }
+        elif self.row is not None:
+            if tag == "time" and attrs.get("datetime"):
+                self.row["created"] = attrs["datetime"]
+            if "job-edit-pencil" in classes:
+                match = re.search(r"/jobapps/(\d+)", attrs.get("href") or "")
+                self.row["id"] = match.group(1) if match else None
+            for css_class, name in self.FIELDS.items():
+                if css_class in classes and self.field is None:
+                    self.field = (name, depth)
+
+    def handle_endtag(self, tag):
+        if tag in self.VOID_TAGS or tag not in self.stack:
+            return
+        depth = len(self.stack) - self.stack[::-1].index(tag)
+        del self.stack[depth - 1 :]
+
+        if self.field and depth <= self.field[1]:
+            self.field = None
+        if self.row is not None and depth <= self.row_depth:
+            row, self.row = self.row, None
+            if row["id"]:
+                row["index"] = len(self.rows)
+                row["name"] = row["name"].strip().split("\n")[0].strip()
+                row["board"] = row["board"].strip()
+                row["offices"] = row["offices"].strip().strip("()")
+                self.rows.append(row)
+        if self.table_depth and depth <= self.table_depth:
+            self.table_depth = None
+
+    def handle_data(self, data):
+        if self.field:
+            self.row[self.field[0]] += data
+
+
+# Greenhouse routes behind the buttons the Selenium backend clicks
+HTTP_ROUTES = {
+    "list": "/plans/{job_id}/jobapp",
+    "duplicate": "/plans/{job_id}/jobapps",
+    "publish": "/jobapps/{app_id}/publish",
+    "unpublish": "/jobapps/{app_id}/unpublish",
+    "delete": "/jobapps/{app_id}",
+    "review": "/application_review",
+    "reject": "/applications/{app_id}/reject",
+}
+
+
+class HttpBackend(Backend):
+    """Talk to Greenhouse directly over a pooled, keep-alive HTTP session."""
+
+    errors = (requests.RequestException, KeyError, ValueError)
+
+    def __init__(self, args):
+        self.args = args
+        self.csrf_token = None
+        self.locations = LocationCache()
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=1, pool_maxsize=max(args.workers, args.concurrency, 10)
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["Accept"] = "text/html,application/json"
+
+        cookies = None if args.fresh_login else load_session()
+        if cookies:
+            self.use_cookies(cookies)
+        if not cookies or not self.signed_in():
+            # SSO and 2FA need a real browser, but only the once
+            self.session.cookies.clear()
+            self.use_cookies(self.sign_in_with_browser())
+
+    def classify(self, error):
+        if isinstance(error, requests.HTTPError) and error.response is not None:
+            status = error.response.status_code
+            return "retry" if status in (408, 429) or status >= 500 else "quarantine"
+        if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+            return "retry"
+        return "quarantine"
+
+    def use_cookies(self, cookies):
+        for cookie in cookies:
+            self.session.cookies.set(
+                cookie["name"],
+                cookie["value"],
+                domain=cookie["domain"],
+                path=cookie.get("path", "/"),
+            )
+
+    def signed_in(self):
+        response = self.session.get(gh_url)
+        return response.ok and (
+            urlparse(response.url).hostname == urlparse(gh_url).hostname
+        )
+
+    def sign_in_with_browser(self):
+        load_selenium()
+        browser = make_browser(self.args)
+        try:
+            ready = Readiness(browser)
+            sso_authenticate(browser, ready, self.args)
+            ready.until("signed in to Greenhouse")
+            save_session(browser)
+            return browser.get_cookies()
+        finally:
+            browser.quit()
+
+    def request(self, method, route, **kwargs):
+        url = gh_url + HTTP_ROUTES[route].format(**kwargs.pop("path", {}))
+        if method != "GET":
+            kwargs.setdefault("headers", {})["X-CSRF-Token"] = self.csrf_token
+        response = self.session.request(method, url, **kwargs)
+        response.raise_for_status()
+        return response
+
+    # requests.Session is fine to share between threads
+    concurrent_pages = 4
+
+    def read_page(self, job_id, page):
+        response = self.request(
+            "GET",
+            "list",
+            path={"job_id": job_id},
+            params={"page": page, "per_page": PAGE_SIZE},
+        )
+        parser = JobTableParser()
+        parser.feed(response.text)
+        self.csrf_token = parser.csrf_token or self.csrf_token
+        return parser
+
+    def page(self, job_id, page):
+        parser = self.read_page(job_id, page)
+        return parser.rows, parser.has_next_page
+
+    def ensure_csrf_token(self, job_id):
+        if self.csrf_token is None:
+            self.read_page(job_id, 1)
+
+    def duplicate(self, job_id, parent, location_text, skip=()):
+        # The new post comes back in the response, there is no looking for it
+        self.ensure_csrf_token(job_id)
+        data = {
+            "from": "duplicate",
+            "greenhouse_job_application_id": parent.app_id,
+            "job_application[name]": parent.name,
+            "job_application[job_board]": JOB_BOARD,
+            "job_application[location]": location_text,
+            "job_application[publish_location]": publish_location_of(location_text),
+            "job_application[remote]": "1",
+            "job_application[indeed]": "1",
+        }
+        # Send the exact suggestion the browser picked, once there is one
+        suggestion = self.locations.get(location_text)
+        if suggestion:
+            data["job_application[publish_location]"] = suggestion["label"]
+            if suggestion["id"]:
+                data["job_application[publish_location_id]"] = suggestion["id"]
+        response = self.request(
+            "POST",
+            "duplicate",
+            path={"job_id": job_id},
+            data=data,
+            headers={"Accept": "application/json"},
+        )
+        return response.json()
+
+    def delete(self, job_id, post):
+        self.ensure_csrf_token(job_id)
+        if post.live:
+            self.request("POST", "unpublish", path={"app_id": post.app_id})
+        self.request("DELETE", "delete", path={"app_id": post.app_id})
+
+    def publish(self, job_id, app_id):
+        self.ensure_csrf_token(job_id)
+        self.request("POST", "publish", path={"app_id": app_id})
+
+    def reject(self, app_id, reason, notes, template):
+        if self.csrf_token is None:
+            # Any page carries the token, not only the job posts ones
+            response = self.request("GET", "review", params={"application_id": app_id})
+            parser = JobTableParser()
+            parser.feed(response.text)
+            self.csrf_token = parser.csrf_token
+        try:
+            self.request(
+                "POST",
+                "reject",
+                path={"app_id": app_id},
+                data={
+                    "rejection_reason": reason,
+                    "rejection_reason_note": notes,
+                    "rejection_template": template,
+                    "send_email": "1",
+                },
+            )
+        except requests.HTTPError as e:
+            # Rejected already, by an earlier attempt or by someone else
+            if e.response is None or e.response.status_code != 409:
+                raise
+
+    def workers(self, count):
+        # requests.Session is fine to share between threads, and its
+        # connection pool is sized for --workers
+        return [self] * count
+
+    def close(self):
+        self.session.close()
+
+
+BACKENDS = {"selenium": SeleniumBackend, "http": HttpBackend}
+
+
+###############################################################
+class BackendLost(Exception):
+    """The backend can not carry on with any post, say the browser is gone."""
+
+
+# Seconds before the first retry of a post, doubling with each one after
+RETRY_BACKOFF = 2
+
+
+def attempt(run, backend, action, function, *args, recover=None, prefix=""):
+    """Call function(*args), retrying the errors the backend classifies as
+    transient with exponential backoff. recover(), when given, is tried before
+    each retry and may return what an attempt that failed to report back did."""
+    for tries in itertools.count():
+        try:
+            if tries and recover is not None:
+                result = recover()
+                if result is not None:
+                    return result
+            return function(*args)
+        except backend.errors as e:
+            verdict = backend.classify(e)
+            if verdict == "fatal":
+                raise BackendLost(f"{action}: {e.__class__.__name__}") from e
+            if verdict == "quarantine" or tries >= run.args.retries:
+                raise
+            delay = RETRY_BACKOFF * 2**tries
+            print(f"{prefix}--> {action}: {e.__class__.__name__}, retrying in {delay}s")
+            time.sleep(delay)
+
+
+def quarantine(run, job_id, what, error, prefix=""):
+    reason = f"{error.__class__.__name__}: {error}".strip().splitlines()[0]
+    print(f"{prefix}--> QUARANTINED {what}: {reason}")
+    run.results["failed"].append((job_id, what, reason))
+
+
+def create_post_with_retries(
+    run, backend, job_id, parent, location_text, prefix="", skip=()
+):
+    # A retry must not make a second post if the last attempt saved one
+    # before it failed, so look for that first. Neither that nor the new post
+    # may be one that is being replaced, which is in the same location.
+    return attempt(
+        run,
+        backend,
+        f"creating {location_text}",
+        backend.duplicate,
+        job_id,
+        parent,
+        location_text,
+        skip,
+        recover=lambda: backend.find_post(job_id, parent.name, location_text, skip),
+        prefix=prefix,
+    )
+
+
+###############################################################
+class Run:
+    """What one invocation of the script works with, and what it has done."""
+
+    def __init__(self, args, index, journal, backend, pool=None):
+        self.args = args
+        self.index = index
+        self.journal = journal
+        self.backend = backend
+        self.pool = pool
+        self.shared_pool = pool is not None
+        self.results = {"created": [], "failed": [], "unpublished": [], "rejected": []}
+
+    def workers(self):
+        if self.pool is None:
+            self.pool = WorkerPool(self.backend, self.args.workers)
+        return self.pool
+
+    def close(self):
+        if self.pool is not None and not self.shared_pool:
+            self.pool.close(self.backend)
+        if self.journal is not None:
+            self.journal.close()
+
+
+def publish_post(run, backend, job_id, parent, location_text, row, prefix=""):
+    """The row of the new post once published, and whether that worked."""
+    try:
+        if row is None:
+            raise LookupError("could not find the new post")
+        with metrics.span("publish", job=job_id):
+            attempt(
+                run,
+                backend,
+                f"publishing {location_text}",
+                backend.publish,
+                job_id,
+                row["id"],
+                prefix=prefix,
+            )
+    except (LookupError, *backend.errors) as e:
+        print(f"{prefix}--> NOT PUBLISHED {location_text}: {e.__class__.__name__}")
+        run.results["unpublished"].append((job_id, parent.app_id, location_text))
+        return row, False
+    run.journal.record("published", job=job_id, app_id=row["id"])
+    return dict(row, live=True, draft=False), True
+
+
+def drain(pending):
+    """Take the items off a queue, which other workers may be taking them off
+    too, until there are none left."""
+    while True:
+        try:
+            yield pending.get_nowait()
+        except queue.Empty:
+            return
+
+
+def create_posts(run, job_id, pending, backend, prefix=""):
+    for parent, location_text in drain(pending):
+        print(f"{prefix}--> Processing {location_text}")
+        backend.recycle_if_due()
+        step = dict(job=job_id, parent=parent.app_id, location=location_text)
+        run.journal.record("creating", **step)
+        try:
+            with metrics.span("create", job=job_id, location=location_text):
+                row = create_post_with_retries(
+                    run, backend, job_id, parent, location_text, prefix
+                )
+        except backend.errors as e:
+            quarantine(run, job_id, f"{location_text} from {parent.app_id}", e, prefix)
+            continue
+        run.journal.record("created", row=row, **step)
+
+        row, _ = publish_post(run, backend, job_id, parent, location_text, row, prefix)
+        run.results["created"].append((job_id, parent.app_id, location_text, row))
+
+
+class WorkerPool:
+    """The main backend and the extra ones sharing its authenticated session,
+    size of them in all."""
+
+    def __init__(self, backend, size):
+        self.backends = [backend, *backend.workers(size - 1)]
+
+    def run(self, function, *args):
+        """Call function(*args, backend, prefix) with each backend at once,
+        prefix being what to start the lines it prints with."""
+        with ThreadPoolExecutor(max_workers=len(self.backends)) as executor:
+            futures = [
+                executor.submit(function, *args, backend, f"[worker {worker}] ")
+                for worker, backend in enumerate(self.backends, 1)
+            ]
+        for future in futures:
+            future.result()
+
+    def close(self, backend):
+        for worker in set(self.backends) - {backend}:
+            backend.merge(worker)
+            worker.close()
+
+
+###############################################################
+class TokenBucket:
+    """Pace requests to Greenhouse, slowing down when it pushes back with 429s
+    or slow responses and creeping back up to the full rate once it recovers."""
+
+    def __init__(self, rate):
+        self.max_rate = self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.fastest = None
+        self.slowed = 0
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.rate, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def slow_down(self):
+        # A burst of requests all pushed back at once only counts the once
+        now = time.monotonic()
+        if now - self.slowed > 1:
+            self.slowed = now
+            self.rate = max(self.rate / 2, 1)
+            self.tokens = min(self.tokens, 1)
+
+    def wait(self, loop):
+        """acquire() for a thread other than the one running the loop."""
+        asyncio.run_coroutine_threadsafe(self.acquire(), loop).result()
+
+    def observe(self, seconds):
+        self.fastest = min(self.fastest or seconds, seconds)
+        if seconds > max(4 * self.fastest, 1):
+            self.slow_down()
+        else:
+            self.rate = min(self.rate + self.max_rate / 20, self.max_rate)
+
+
+def use_threads(count):
+    """Let asyncio.to_thread() run count calls at once, which its default
+    executor caps at a few more than the CPUs."""
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=count))
+
+
+async def call_paced(bucket, run, function, *args, recover=None):
+    """Like attempt(), but paced by the bucket, and pushed back requests (429s)
+    are retried more patiently, as only the rate was wrong. recover is given
+    a function to call before each request it makes, which paces it too."""
+    backend = run.backend
+    loop = asyncio.get_running_loop()
+    retries = pushed_back = 0
+    # Whether the last attempt may have gone through before it failed, which
+    # a pushed back one never does
+    doubtful = False
+    while True:
+        try:
+            if doubtful and recover is not None:
+                result = await asyncio.to_thread(recover, lambda: bucket.wait(loop))
+                if result is not None:
+                    return result
+                doubtful = False
+            await bucket.acquire()
+            start = time.monotonic()
+            result = await asyncio.to_thread(function, *args)
+        except backend.errors as e:
+            verdict = backend.classify(e)
+            if verdict == "fatal":
+                raise BackendLost(e.__class__.__name__) from e
+            if verdict == "quarantine":
+                raise
+            response = getattr(e, "response", None)
+            if response is not None and response.status_code == 429:
+                pushed_back += 1
+                if pushed_back == 6:
+                    raise
+                bucket.slow_down()
+                retry_after = response.headers.get("Retry-After", "")
+                await asyncio.sleep(float(retry_after) if retry_after.isdigit() else 1)
+                continue
+            if retries >= run.args.retries:
+                raise
+            await asyncio.sleep(RETRY_BACKOFF * 2**retries)
+            retries += 1
+            doubtful = True
+        else:
+            bucket.observe(time.monotonic() - start)
+            return result
+
+
+async def create_posts_concurrently(run, job_id, creates):
+    backend = run.backend
+    bucket = TokenBucket(run.args.rate)
+    limit = asyncio.Semaphore(run.args.concurrency)
+    use_threads(run.args.concurrency)
+
+    async def create_and_publish(parent, location_text):
+        async with limit:
+            step = dict(job=job_id, parent=parent.app_id, location=location_text)
+            run.journal.record("creating", **step)
+            try:
+                with metrics.span("create", job=job_id, location=location_text):
+                    row = await call_paced(
+                        bucket,
+                        run,
+                        backend.duplicate,
+                        job_id,
+                        parent,
+                        location_text,
+                        recover=lambda pace: backend.find_post(
+                            job_id, parent.name, location_text, pace=pace
+                        ),
+                    )
+            except backend.errors as e:
+                quarantine(run, job_id, f"{location_text} from {parent.app_id}", e)
+                return
+            run.journal.record("created", row=row, **step)
+
+            try:
+                with metrics.span("publish", job=job_id):
+                    await call_paced(bucket, run, backend.publish, job_id, row["id"])
+            except backend.errors as e:
+                print(f"--> NOT PUBLISHED {location_text}: {e.__class__.__name__}")
+                run.results["unpublished"].append(
+                    (job_id, parent.app_id, location_text)
+                )
+            else:
+                print(f"--> Created {location_text}")
+                run.journal.record("published", job=job_id, app_id=row["id"])
+                row = dict(row, live=True, draft=False)
+            run.results["created"].append((job_id, parent.app_id, location_text, row))
+
+    await asyncio.gather(
+        *(
+            create_and_publish(parent, location_text)
+            for parent, location_text in creates
+        )
+    )
+
+
+###############################################################
+def execute_plan(run, plan):
+    job_id = plan.job_id
+    if plan.deletes:
+        delete_posts(run, plan)
+    if plan.replaces:
+        replace_posts(run, plan)
+
+    pending = queue.Queue()
+    for parent, location_text in plan.creates:
+        pending.put((parent, location_text))
+
+    if run.args.concurrency:
+        asyncio.run(create_posts_concurrently(run, job_id, plan.creates))
+    elif run.args.workers > 1 and pending.qsize() > 1:
+        run.workers().run(create_posts, run, job_id, pending)
+    else:
+        create_posts(run, job_id, pending, run.backend)
+
+    for created_job_id, canonical_job_id, _, row in run.results["created"]:
+        if created_job_id == job_id and row is not None:
+            run.index.update(job_id, [row], parent=canonical_job_id)
+
+    if plan.publishes:
+        publish_drafts(run, plan)
+
+
+class Pipeline:
+    """The plan of each job, harvested ahead of time: the harvests run one
+    after another on a backend of their own, so reading the next job overlaps
+    with carrying out the plan of the one before."""
+
+    def __init__(self, run, plans):
+        self.run = run
+        self.plans = plans
+        # A job given twice is carried out once, its plan would be stale the
+        # second time round
+        self.job_ids = list(dict.fromkeys(run.args.job_ids))
+        pending = [job_id for job_id in self.job_ids if job_id not in plans]
+        # Only the harvest of a single job has nothing running alongside it,
+        # the plans of resumed jobs are carried out while it runs
+        if len(self.job_ids) == 1 or not pending:
+            self.reader = run.backend
+        else:
+            self.reader = run.backend.workers(1)[0]
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.planned = {
+            job_id: self.executor.submit(self.plan, job_id) for job_id in pending
+        }
+
+    def plan(self, job_id):
+        args = self.run.args
+        # SQLite connections stay in the thread that opened them
+        index = PostIndex()
+        try:
+            # Its pages count towards recycling like those of any other browser
+            self.reader.recycle_if_due()
+            harvest(self.reader, index, job_id, args.reset_all or args.full_harvest)
+            plan = plan_job(job_id, Inventory(index.posts(job_id)), args)
+        finally:
+            index.db.close()
+        self.run.journal.record_plan(plan)
+        return plan
+
+    def __iter__(self):
+        for job_id in self.job_ids:
+            if job_id in self.plans:
+                yield self.plans[job_id]
             else:
-                break
+                yield self.planned[job_id].result()
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+        if self.reader is not self.run.backend:
+            self.run.backend.merge(self.reader)
+            self.reader.close()
+
+
+def warm_locations(args, index, backend):
+    job_id = args.job_ids[0]
+    harvest(backend, index, job_id, args.full_harvest)
+    parents = Inventory(index.posts(job_id)).parents()
+    if not parents:
+        raise SystemExit(f"Job {job_id} has no parent post to open the form of")
+
+    location_texts = [
+        location_text for region in args.regions for location_text in REGIONS[region]
+    ]
+    print(f"[Looking up {len(location_texts)} publish locations]")
+    backend.warm_locations(job_id, parents[0], location_texts)
+
+
+def print_results(results):
+    created, failed = len(results["created"]), len(results["failed"])
+    if created or failed:
+        print(f"Created {created} posts, {failed} quarantined")
+    for job_id, what, reason in results["failed"]:
+        print(f"  QUARANTINED job {job_id}, {what}: {reason}")
+    for job_id, canonical_job_id, location_text in results["unpublished"]:
+        print(
+            f"  NOT PUBLISHED job {job_id}, parent {canonical_job_id}: {location_text}"
+        )
 
-        # return to first page of job posts
-        if multipage:
-            browser.get(job_posts_page_url)
-            time.sleep(3.5)
 
-        # Process updates for each `Canonical` job unless a limit arg is passed
-        if args.limit:
-            canonical_list = [args.limit]
+def check_locations(index, job_ids):
+    """Go over the posts of the jobs in the index once, before anything is
+    changed, for locations the catalog only knows by another spelling."""
+    for job_id in job_ids:
+        for post in index.posts(job_id):
+            location = CATALOG.get(post.location)
+            if location is not None and location.text != post.location:
+                print(
+                    f"WARNING: post {post.app_id} in '{post.location}' is taken "
+                    f"to be in '{location.text}'"
+                )
+
+
+def run_command(args, argv, backend=None, pool=None):
+    """Carry out one invocation of the script, with the given backend (and
+    pool of workers) if there is one already, or a new one otherwise."""
+    index = PostIndex()
+    metrics.reset()
+    check_locations(index, args.job_ids)
+
+    if args.dry_run:
+        for job_id in args.job_ids:
+            if not index.has(job_id):
+                print(f"Job {job_id} has not been harvested yet, nothing to plan")
+                continue
+            print_plan(plan_job(job_id, Inventory(index.posts(job_id)), args))
+        return
+
+    journal = Journal()
+    if args.resume:
+        if not journal.unfinished():
+            print("The last run finished, there is nothing to resume")
+            return
+        entries = journal.entries()
+        argv = entries[0]["argv"]
+        print(f"[Resuming ./post-job.py {' '.join(argv)}]")
+        args = parse_args(argv)
+    else:
+        entries = None
+
+    if args.metrics:
+        metrics.open(args.metrics)
+    if pool is not None:
+        # Commands use the daemon's browsers, however many it keeps
+        args.workers = len(pool.backends)
+
+    own_backend = backend is None
+    if own_backend:
+        backend = BACKENDS[args.backend](args)
+    try:
+        if args.warm_locations:
+            warm_locations(args, index, backend)
+            return
+
+        if entries:
+            journal.reopen()
         else:
-            canonical_list = [
-                existing_ids[i]
-                for i, x in enumerate(existing_types)
-                if x in JOB_BOARDS_PROTECTED
-            ]
+            journal.start(argv)
+        run = Run(args, index, journal, backend, pool)
+        pipeline = None
+        try:
+            pipeline = Pipeline(run, resume_plans(run, entries) if entries else {})
+            for plan in pipeline:
+                print_plan(plan)
+                execute_plan(run, plan)
+            journal.record("finished")
+        finally:
+            if pipeline is not None:
+                pipeline.close()
+            run.close()
+    finally:
+        if own_backend:
+            backend.close()
+
+    print_results(run.results)
+    if backend.summary():
+        print(backend.summary())
+    created = len(run.results["created"])
+    if metrics.timings:
+        print(metrics.summary(created))
+    if args.prometheus:
+        metrics.write_prometheus(args.prometheus, created)
+    metrics.close()
+    print("All done! Now go bring those candidates through to offers!")
 
-        for canonical_job_id in canonical_list:
-            canonical_job_name = [
-                existing_names[i]
-                for i, x in enumerate(existing_ids)
-                if canonical_job_id == x
-            ][0]
-            limited_locations = [
-                existing_locations[i]
-                for i, x in enumerate(existing_names)
-                if canonical_job_name in x
-            ]
 
-            print(f'[Creating posts for "{canonical_job_name}"]')
-            for region in args.regions:
-                print(f"-> Processing {region}")
-                region_locations = REGIONS[region]
-                new_locations = set(region_locations) - set(limited_locations)
+###############################################################
+@dataclass
+class Rejection:
+    app_id: str
+    preset: str
+    notes: str
+
+
+def rejection_records(f, jsonl):
+    if not jsonl:
+        # Line 1 is the header
+        yield from enumerate(csv.DictReader(f), 2)
+        return
+    for number, line in enumerate(f, 1):
+        if line.strip():
+            try:
+                yield number, json.loads(line)
+            except ValueError:
+                yield number, None
+
+
+def read_rejections(path):
+    """The rejections in a CSV or JSONL file, checking every line before any
+    application is rejected."""
+    presets = {name.lower(): name for name in REJECTION_PRESETS}
+    rejections, problems, seen = [], [], set()
+    with open(path, newline="") as f:
+        for number, record in rejection_records(f, path.endswith(".jsonl")):
+            if not isinstance(record, dict):
+                problems.append(f"line {number}: not a JSON object")
+                continue
+            app_id = str(record.get("application_id") or "").strip()
+            reason = str(record.get("reason") or "").strip()
+            if not app_id.isdigit():
+                problems.append(f"line {number}: no numeric application_id")
+            elif reason.lower() not in presets:
+                problems.append(f"line {number}: unknown reason '{reason}'")
+            elif app_id in seen:
+                problems.append(f"line {number}: {app_id} is listed twice")
+            else:
+                seen.add(app_id)
+                preset = presets[reason.lower()]
+                notes = record.get("notes") or REJECTION_PRESETS[preset][1]
+                rejections.append(Rejection(app_id, preset, notes))
+    if problems:
+        raise SystemExit("\n".join([f"Can not use {path}:", *problems]))
+    return rejections
 
-                if not new_locations:
-                    print(f"--> All locations already exist.")
-                    continue
 
-                for location_text in sorted(new_locations):
-                    print(f"--> Processing {location_text}")
-                    publish_location_text = location_text.split(",", 1)[-1].strip()
+def rejected(run, rejection, total, prefix=""):
+    run.results["rejected"].append(rejection)
+    done = len(run.results["rejected"]) + len(run.results["failed"])
+    print(f"{prefix}[{done}/{total}] Rejected {rejection.app_id} ({rejection.preset})")
 
-                    browser.get(
-                        f"{job_posts_page_url}s/new?from=duplicate&amp;greenhouse_job_application_id={canonical_job_id}"
-                    )
-                    time.sleep(3.5)
-                    remove_tooltips(browser)
-
-                    browser.refresh()
-                    job_name_txt = browser.find_elements(
-                        By.XPATH,
-                        '//input[contains(@class, "Input__InputElem-sc-ipbxf8-0")]',
-                    )[0]
-                    job_name = (
-                        job_name_txt.get_attribute("value")
-                        .replace("Copy of ", "")
-                        .strip()
-                    )
 
-                    job_name_txt.clear()
-                    job_name_txt.send_keys(job_name)
-
-                    post_to = browser.find_elements(
-                        By.XPATH, '//label[text()="Post To"]/..//input[1]'
-                    )[0]
-                    post_to.send_keys(JOB_BOARD)
-                    post_to.send_keys(Keys.ENTER)
-
-                    location = browser.find_elements(
-                        By.XPATH, '//label[text()="Location"]/..//input[1]'
-                    )[0]
-                    location.clear()
-                    location.send_keys(location_text)
-
-                    ## Publish the posts out to our external partner sites
-                    # try:
-                    #     browser.find_elements(By.XPATH, '//label[text()="Glassdoor"]/input[1]')[0].click()
-                    # except:
-                    #     print("INFO: Glassdoor board not available at the moment")
-
-                    try:
-                        browser.find_elements(
-                            By.XPATH, '//label[text()="Indeed"]/input[1]'
-                        )[0].click()
-                    except:
-                        print("INFO: Indeed board not available at the moment")
-
-                    publish_location = browser.find_elements(
-                        By.XPATH, '//input[@placeholder="Select location"]'
-                    )[0]
-                    publish_location.clear()
-                    publish_location.send_keys(publish_location_text)
-                    popup_menu_xpath = (
-                        f'//ul[contains(@class, "ui-menu")]'
-                        f'/li[contains(@class, "ui-menu-item")]'
-                        f'/div[contains(text(), "{publish_location_text}")]'
-                    )
-                    location_choices = wait.until(
-                        lambda browser: browser.find_elements(
-                            By.XPATH, popup_menu_xpath
-                        )
-                    )
-                    publish_location.send_keys(Keys.DOWN)
-                    publish_location.send_keys(Keys.TAB)
-
-                    browser.find_elements(
-                        By.XPATH, '//label[text()="Remote"]/input[1]'
-                    )[0].click()
-                    time.sleep(0.5)
-
-                    # click the Save button
-                    save_btn = browser.find_elements(By.XPATH, '//a[text()="Save"]')[0]
-                    save_btn.click()
-
-                    wait.until(
-                        lambda browser: browser.find_elements(
-                            By.CLASS_NAME, "job-application__offices"
-                        )
+def reject_pending(run, pending, total, backend, prefix=""):
+    for rejection in drain(pending):
+        backend.recycle_if_due()
+        reason, _ = REJECTION_PRESETS[rejection.preset]
+        try:
+            with metrics.span("reject"):
+                attempt(
+                    run,
+                    backend,
+                    f"rejecting {rejection.app_id}",
+                    backend.reject,
+                    rejection.app_id,
+                    reason,
+                    rejection.notes,
+                    REJECTION_TEMPLATE,
+                    prefix=prefix,
+                )
+        except backend.errors as e:
+            quarantine(run, None, f"application {rejection.app_id}", e, prefix)
+            continue
+        rejected(run, rejection, total, prefix)
+
+
+async def reject_concurrently(run, rejections):
+    backend = run.backend
+    bucket = TokenBucket(run.args.rate)
+    limit = asyncio.Semaphore(run.args.concurrency)
+    use_threads(run.args.concurrency)
+
+    async def reject(rejection):
+        async with limit:
+            reason, _ = REJECTION_PRESETS[rejection.preset]
+            try:
+                with metrics.span("reject"):
+                    await call_paced(
+                        bucket,
+                        run,
+                        backend.reject,
+                        rejection.app_id,
+                        reason,
+                        rejection.notes,
+                        REJECTION_TEMPLATE,
                     )
+            except backend.errors as e:
+                quarantine(run, None, f"application {rejection.app_id}", e)
+                return
+            rejected(run, rejection, len(rejections))
+
+    await asyncio.gather(*(reject(rejection) for rejection in rejections))
+
+
+def reject_command(args):
+    rejections = read_rejections(args.file)
+    print(f"[Rejecting {len(rejections)} applications]")
+    for preset in REJECTION_PRESETS:
+        count = sum(rejection.preset == preset for rejection in rejections)
+        if count:
+            print(f"-> {count} {preset}")
+    if args.dry_run or not rejections:
+        return
+
+    pending = queue.Queue()
+    for rejection in rejections:
+        pending.put(rejection)
+
+    metrics.reset()
+    backend = BACKENDS[args.backend](args)
+    try:
+        run = Run(args, None, None, backend)
+        try:
+            if args.concurrency:
+                asyncio.run(reject_concurrently(run, rejections))
+            elif args.workers > 1 and len(rejections) > 1:
+                run.workers().run(reject_pending, run, pending, len(rejections))
+            else:
+                reject_pending(run, pending, len(rejections), backend)
+        finally:
+            run.close()
+    finally:
+        backend.close()
 
-        print(f"[Marking all job posts live]")
-        browser.get(job_posts_page_url)
-        page = 1
+    rejected_count, failed = len(run.results["rejected"]), run.results["failed"]
+    print(f"Rejected {rejected_count} applications, {len(failed)} quarantined")
+    for _, what, reason in failed:
+        print(f"  QUARANTINED {what}: {reason}")
+    if backend.summary():
+        print(backend.summary())
 
-        while True:
-            print(f"-> Processing page {page}")
-            time.sleep(3.5)
 
-            # Ensure page navigation and job details have had sufficient time to load
-            wait.until(
-                lambda browser: browser.find_elements(
-                    By.CLASS_NAME, "job-application__offices"
-                )
+def parse_reject_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="post-job.py reject",
+        description="Reject applications in bulk, with the presets of app-review.tm.js.",
+    )
+    parser.add_argument(
+        "file",
+        help="A CSV file, or a JSONL one (ending in .jsonl), with an application_id "
+        "and a reason (one of: " + ", ".join(REJECTION_PRESETS) + ") for each "
+        "application, and optionally notes to use instead of the preset's",
+    )
+    add_session_arguments(parser)
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Check the file and count the rejections, without starting a browser",
+    )
+    add_pacing_arguments(parser, "applications")
+    args = parser.parse_args(argv)
+    if args.concurrency and args.backend != "http":
+        parser.error("--concurrency needs --backend http")
+    return args
+
+
+###############################################################
+INVENTORY_FIELDS = [
+    "job",
+    "app_id",
+    "name",
+    "board",
+    "location",
+    "live",
+    "created",
+    "gap",
+]
+
+
+class InventoryWriter:
+    """Write inventory rows to CSV or JSONL as they come, from any thread."""
+
+    def __init__(self, f, jsonl):
+        self.f = f
+        self.jsonl = jsonl
+        self.lock = threading.Lock()
+        self.csv = None if jsonl else csv.DictWriter(f, fieldnames=INVENTORY_FIELDS)
+        if self.csv:
+            self.csv.writeheader()
+
+    def write(self, rows):
+        with self.lock:
+            for row in rows:
+                if self.jsonl:
+                    self.f.write(json.dumps(row) + "\n")
+                else:
+                    self.csv.writerow(row)
+            self.f.flush()
+
+
+def coverage_gaps(job_id, posted, regions):
+    """Gap rows for the locations of the regions with no post, or none that
+    is live, going by location key. Without regions, those the job
+    has any post in."""
+    if not regions:
+        regions = {
+            region
+            for key in posted
+            if key in CATALOG.by_key
+            for region in CATALOG.by_key[key].regions
+        }
+    # Regions can overlap, each location is only flagged the once
+    flagged = set()
+    for region in sorted(regions):
+        for location in REGIONS[region]:
+            key = location_key(location)
+            if key in flagged or posted.get(key):
+                continue
+            flagged.add(key)
+            yield dict(
+                dict.fromkeys(INVENTORY_FIELDS, ""),
+                job=job_id,
+                location=location,
+                live=False,
+                gap="not live" if key in posted else "missing",
             )
 
-            ## Click the "Enable" button on each new post created, to make it live
-            publish_btns = browser.find_elements(
-                By.XPATH,
-                '//tr[@class="job-application draft external"]//img[@class="publish-application-button"]',
+
+def inventory_job(args, backend, writer, job_id, log, prefix=""):
+    # Only whether each location has a live post is kept, never the rows
+    posted = defaultdict(bool)
+    posts = 0
+    for rows in backend.all_pages(job_id):
+        writer.write(
+            dict(
+                job=job_id,
+                app_id=row["id"],
+                name=row["name"],
+                board=row["board"],
+                location=row["offices"],
+                live=row["live"],
+                created=row.get("created") or "",
+                gap="",
             )
-            for btn in publish_btns:
-                btn.click()
-                time.sleep(0.5)
+            for row in rows
+        )
+        posts += len(rows)
+        # The parent posts cover their own locations too, as they do when
+        # planning what to create
+        for row in rows:
+            posted[location_key(row["offices"])] |= row["live"]
+    gaps = list(coverage_gaps(job_id, posted, args.regions))
+    writer.write(gaps)
+    print(f"{prefix}-> Job {job_id}: {posts} posts, {len(gaps)} gaps", file=log)
+    return posts, len(gaps)
+
+
+def inventory_jobs(args, writer, pending, totals, log, backend, prefix=""):
+    for job_id in drain(pending):
+        backend.recycle_if_due()
+        try:
+            posts, gaps = inventory_job(args, backend, writer, job_id, log, prefix)
+        except backend.errors as e:
+            print(f"{prefix}-> FAILED job {job_id}: {e.__class__.__name__}", file=log)
+            totals["failed"].append(job_id)
+            continue
+        totals["posts"].append(posts)
+        totals["gaps"].append(gaps)
 
-            next_page = browser.find_elements(By.CLASS_NAME, "next_page")
-            if not next_page:
-                break
 
-            if "disabled" not in next_page[0].get_attribute("class"):
-                next_page[0].click()
-                page += 1
-            else:
-                break
+def inventory_command(args):
+    jsonl = args.format == "jsonl" or (
+        args.format is None and args.output.endswith(".jsonl")
+    )
+    # Progress goes out of the way of the rows, when they go to stdout
+    log = sys.stderr if args.output == "-" else sys.stdout
+    pending = queue.Queue()
+    for job_id in args.job_ids:
+        pending.put(job_id)
+    totals = {"posts": [], "gaps": [], "failed": []}
+
+    print(f"[Taking the inventory of {len(args.job_ids)} jobs]", file=log)
+    backend = BACKENDS[args.backend](args)
+    f = sys.stdout if args.output == "-" else open(args.output, "w", newline="")
+    try:
+        writer = InventoryWriter(f, jsonl)
+        workers = min(args.workers, len(args.job_ids))
+        if workers > 1:
+            pool = WorkerPool(backend, workers)
+            try:
+                pool.run(inventory_jobs, args, writer, pending, totals, log)
+            finally:
+                pool.close(backend)
+        else:
+            inventory_jobs(args, writer, pending, totals, log, backend)
+    finally:
+        if f is not sys.stdout:
+            f.close()
+        backend.close()
+
+    print(
+        f"{sum(totals['posts'])} posts and {sum(totals['gaps'])} gaps in "
+        f"{len(totals['posts'])} jobs",
+        file=log,
+    )
+    if totals["failed"]:
+        raise SystemExit(f"Could not read job(s) {', '.join(totals['failed'])}")
 
-    print("All done! Now go bring those candidates through to offers!")
+
+def parse_inventory_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="post-job.py inventory",
+        description="Write out every post of the given jobs, and the locations of "
+        "their regions left without a live one.",
+    )
+    parser.add_argument("job_ids", nargs="+", help="The numeric Greenhouse job ids")
+    parser.add_argument(
+        "--region",
+        dest="regions",
+        nargs="+",
+        choices=sorted(REGIONS.keys()),
+        help="The regions to look for gaps in (default is every region a job "
+        "has a post in)",
+    )
+    parser.add_argument(
+        "--output",
+        default="-",
+        help="The file to write the posts to (default is stdout)",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["csv", "jsonl"],
+        help="The format to write (default is jsonl for an --output ending in "
+        ".jsonl, and csv otherwise)",
+    )
+    add_session_arguments(parser)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of jobs to read at once, each in its own browser session "
+        "with the selenium backend (default is 1)",
+    )
+    # The HTTP backend sizes its connection pool with these
+    parser.set_defaults(concurrency=0)
+    return parser.parse_args(argv)
+
+
+###############################################################
+def socket_path(args):
+    return args.socket or os.path.join(user_data_dir("greenhouse"), "daemon.sock")
+
+
+class ClientWriter:
+    """Stream what a command prints back to the --connect client, a line at a
+    time."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.buffer = ""
+
+    def write(self, text):
+        self.buffer += text
+        while "\n" in self.buffer:
+            line, self.buffer = self.buffer.split("\n", 1)
+            self.send(output=line)
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def send(self, **message):
+        try:
+            self.connection.sendall((json.dumps(message) + "\n").encode())
+        except OSError:
+            # The client went away, the command carries on regardless
+            pass
+
+
+class Shutdown(BaseException):
+    """The daemon was told to stop, which no command it is running may catch."""
+
+
+def shutdown(*_):
+    raise Shutdown
+
+
+class Daemon:
+    """Signed-in browsers kept warm between the commands of --connect clients,
+    and replaced every so often before they grow too big."""
+
+    def __init__(self, args):
+        self.args = args
+        self.backend = None
+        self.pool = None
+        self.started = None
+
+    def start(self):
+        print(f"[Starting {self.args.workers} warm {self.args.backend} session(s)]")
+        self.backend = BACKENDS[self.args.backend](self.args)
+        if self.args.workers > 1:
+            self.pool = WorkerPool(self.backend, self.args.workers)
+        self.started = time.monotonic()
+
+    def stop(self):
+        if self.pool is not None:
+            self.pool.close(self.backend)
+        if self.backend is not None:
+            self.backend.close()
+        self.backend = self.pool = None
+
+    def recycle_if_due(self):
+        if time.monotonic() - self.started > self.args.recycle_after * 60:
+            print("[Recycling the browsers]")
+            self.stop()
+            self.start()
+
+    def handle(self, connection):
+        try:
+            request = json.loads(connection.makefile().readline())
+            client_cwd, argv = request["cwd"], request["argv"]
+        except (OSError, ValueError, TypeError, KeyError):
+            # Not a --connect client, say another --serve checking whether
+            # this daemon is there, which sends nothing
+            return
+        writer = ClientWriter(connection)
+        cwd = os.getcwd()
+        code = 0
+        with redirect_stdout(writer), redirect_stderr(writer):
+            try:
+                # Relative paths in the command are the client's
+                os.chdir(client_cwd)
+                args = parse_args(argv)
+                run_command(args, argv, self.backend, self.pool)
+            except SystemExit as e:
+                if isinstance(e.code, str):
+                    print(e.code)
+                code = 0 if e.code is None else e.code if isinstance(e.code, int) else 1
+            except BackendLost as e:
+                print(f"ERROR: Backend lost ({e}), carry on with --resume")
+                code = 1
+                self.stop()
+                self.start()
+            except Exception:
+                traceback.print_exc()
+                code = 1
+                # Nothing more is known about the state the browsers are in
+                self.stop()
+                self.start()
+            finally:
+                os.chdir(cwd)
+        writer.send(exit=code)
+
+
+def serve(args):
+    path = socket_path(args)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if os.path.exists(path):
+        try:
+            with socket.socket(socket.AF_UNIX) as probe:
+                probe.connect(path)
+        except ConnectionRefusedError:
+            os.remove(path)
+        else:
+            raise SystemExit(f"A daemon is already listening on {path}")
+
+    # Stopping the daemon must never leave browsers or drivers behind
+    signal.signal(signal.SIGTERM, shutdown)
+    server = socket.socket(socket.AF_UNIX)
+    daemon = Daemon(args)
+    try:
+        daemon.start()
+        server.bind(path)
+        os.chmod(path, 0o600)
+        server.listen()
+        server.settimeout(60)
+        print(f"[Listening on {path}, run commands with --connect]")
+        while True:
+            daemon.recycle_if_due()
+            try:
+                connection, _ = server.accept()
+            except socket.timeout:
+                continue
+            with connection:
+                daemon.handle(connection)
+    except (KeyboardInterrupt, Shutdown):
+        pass
+    finally:
+        daemon.stop()
+        server.close()
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def connect(args, argv):
+    path = socket_path(args)
+    client = socket.socket(socket.AF_UNIX)
+    try:
+        client.connect(path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        raise SystemExit(f"No daemon is listening on {path}, start one with --serve")
+
+    request = {"argv": argv, "cwd": os.getcwd()}
+    client.sendall((json.dumps(request) + "\n").encode())
+    for line in client.makefile():
+        message = json.loads(line)
+        if "exit" in message:
+            sys.exit(message["exit"])
+        print(message["output"])
+    raise SystemExit("The daemon went away before the command finished")
+
+
+def main():
+    if sys.argv[1:2] and sys.argv[1] in SUBCOMMANDS:
+        parse, command = SUBCOMMANDS[sys.argv[1]]
+        try:
+            command(parse(sys.argv[2:]))
+        except BackendLost as e:
+            raise SystemExit(f"ERROR: Backend lost ({e})")
+        return
+
+    args = parse_args()
+    if args.serve:
+        serve(args)
+    elif args.connect:
+        connect(args, sys.argv[1:])
+    else:
+        try:
+            run_command(args, sys.argv[1:])
+        except BackendLost as e:
+            raise SystemExit(f"ERROR: Backend lost ({e}), carry on with --resume")
+
+
+SUBCOMMANDS = {
+    "reject": (parse_reject_args, reject_command),
+    "inventory": (parse_inventory_args, inventory_command),
+}
 
 
 if __name__ == "__main__":